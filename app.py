@@ -1,21 +1,101 @@
 import streamlit as st
+import asyncio
 import os
+import queue
+import threading
+import uuid
+from functools import partial
 import pandas as pd
 from typing import Generator
-from langchain_core.messages import HumanMessage, AIMessage
+from langchain_core.messages import HumanMessage, AIMessage, ToolMessage
 
 
 from dotenv import load_dotenv, find_dotenv
 
 load_dotenv(find_dotenv(), override=True)
 
-from src.sql_utils import excel_to_sqlite, add_table_to_sqlite_db_from_df, delete_db
-from src.agent import graph
-from src.db import db
+from src.sql_utils import (
+    ingest_csv_files,
+    get_table_preview,
+    delete_db,
+)
+from src.agent import get_graph
+from src.state import turn_input
+from src.formatters import format_result
+from src.catalog import catalog
+from src.query_cache import query_cache
+from src.index_advisor import index_advisor
+from src.tracing import RequestTracer, metrics
 
 
-def stream_values(response) -> Generator[str, None, None]:
+@st.cache_resource
+def load_graph():
+    # Compiled once per server process and shared by all sessions and reruns.
+    # Conversations are kept by the checkpointer unless CHECKPOINT_DB_PATH is empty.
+    return get_graph(checkpointer=True)
+
+
+def get_thread_id() -> str:
+    # Kept in the URL, so a reload or a server restart resumes the conversation.
+    if "thread" not in st.query_params:
+        st.query_params["thread"] = uuid.uuid4().hex
+    return st.query_params["thread"]
+
+
+def chat_history(messages: list) -> list:
+    """
+    Rebuilds the chat shown in the UI from checkpointed messages: every question
+    and the last AI message of its turn, i.e. the final answer.
+    """
+    history = []
+    for message in messages:
+        if isinstance(message, HumanMessage):
+            history.append({"role": "user", "content": message.content})
+        elif isinstance(message, AIMessage) and history:
+            answer = {"role": "ai", "content": message.content}
+            if history[-1]["role"] == "ai":
+                history[-1] = answer
+            else:
+                history.append(answer)
+    return history
+
+
+def astream_in_thread(graph, **kwargs) -> Generator:
+    """
+    Runs ``graph.astream`` on an event loop in a background thread and yields its
+    chunks, so Streamlit can consume the async graph like a sync stream.
+    """
+    chunks = queue.Queue()
+    done = object()
+
+    async def produce():
+        async for chunk in graph.astream(**kwargs):
+            chunks.put(chunk)
+
+    def run():
+        try:
+            asyncio.run(produce())
+        except Exception as e:
+            chunks.put(e)
+        finally:
+            chunks.put(done)
+
+    threading.Thread(target=run, daemon=True).start()
+    while (chunk := chunks.get()) is not done:
+        if isinstance(chunk, Exception):
+            raise chunk
+        yield chunk
+
+
+def stream_values(response, query_results=None) -> Generator[str, None, None]:
     for msg, metadata in response:
+        if (
+            query_results is not None
+            and isinstance(msg, ToolMessage)
+            and msg.name == "db_query_tool"
+            and msg.artifact
+        ):
+            query_results.append(msg.artifact)
         if (
             msg.content
             and not isinstance(msg, HumanMessage)
@@ -40,8 +120,13 @@ def main() -> None:
     col1, col2 = st.columns([1.5, 2])
 
     # Initialize session state
+    thread_config = {"configurable": {"thread_id": get_thread_id()}}
     if "messages" not in st.session_state:
         st.session_state["messages"] = []
+        if load_graph().checkpointer:
+            st.session_state["messages"] = chat_history(
+                load_graph().get_state(thread_config).values.get("messages", [])
+            )
     if "use_sample" not in st.session_state:
         st.session_state["use_sample"] = False
     if "excel_file" not in st.session_state:
@@ -69,34 +154,48 @@ def main() -> None:
             # Button to show the selected sheets
             if col1.button("Create SQL DB"):
                 if st.session_state["excel_file"]:
-                    # Iterate over each uploaded file
-                    i = 0
-                    for file in st.session_state["excel_file"]:
-                        print()
-                        print(f"processing file {i+1}:>>>>>>")
-                        i += 1
-                        # Display PDF pages
-                        with col1:
-                            with st.container(height=410, border=True):
-                                st.write(f"Showing sheets for {file.name}:")
-
-                                # Try reading the sheets
-                                try:
-                                    df = pd.read_csv(file)
-                                    # st.write(f"Sheet: {sheet}")
-                                    st.write(df)
-                                    print(f"Creating SQL DB......")
-                                    db_path = os.getenv("SQL_DB_PATH_VAR")
-
-                                    add_table_to_sqlite_db_from_df(
-                                        df=df,
-                                        db_path=db_path,
-                                        table_name=os.path.splitext(file.name)[0],
-                                    )
-                                    st.session_state["sql_db"].append(db_path)
-
-                                except Exception as e:
-                                    st.error(f"Error reading {file.name}: {str(e)}")
+                    print(f"Creating SQL DB......")
+                    db_path = os.getenv("SQL_DB_PATH_VAR")
+                    files = st.session_state["excel_file"]
+                    with col1:
+                        progress = st.progress(0.0, text="Parsing uploaded files...")
+                        file_container = st.container(height=410, border=True)
+                    done = []
+
+                    def show_progress(result):
+                        done.append(result)
+                        progress.progress(
+                            len(done) / len(files),
+                            text=f"Processed {len(done)} of {len(files)} files",
+                        )
+                        with file_container:
+                            if "error" in result:
+                                st.error(
+                                    f"Error reading {result['file_name']}: {result['error']}"
+                                )
+                                return
+                            st.write(f"Showing sheets for {result['file_name']}:")
+                            st.write(get_table_preview(db_path, result["table_name"]))
+                            st.caption(
+                                f"{result['rows']:,} rows, parsed in "
+                                f"{result['parse_seconds']:.2f}s, written in "
+                                f"{result['seconds']:.2f}s "
+                                f"({result['rows_per_second']:,.0f} rows/s)"
+                            )
+
+                    try:
+                        summary = ingest_csv_files(
+                            files=[(file.name, file.getvalue()) for file in files],
+                            db_path=db_path,
+                            on_progress=show_progress,
+                        )
+                        st.session_state["sql_db"].append(db_path)
+                        col1.success(
+                            f"Loaded {len(files)} files ({summary['rows']:,} rows) "
+                            f"in {summary['seconds']:.2f}s"
+                        )
+                    except Exception as e:
+                        st.error(f"Error creating SQL DB: {str(e)}")
                 else:
                     st.warning("Please upload files first...")
 
@@ -106,8 +205,7 @@ def main() -> None:
         if os.getenv("SQL_DB_PATH_VAR"):
             delete_db(os.getenv("SQL_DB_PATH_VAR"))
     with col2:
-        query = "SELECT name FROM sqlite_master WHERE type='table';"
-        tables = db.run(query)
+        tables = ", ".join(catalog.get_usable_table_names())
         print(f"db status: {tables}")
         message_container = st.container(height=500, border=True)
         # Display chat messages from history on app rerun
@@ -122,13 +220,46 @@ def main() -> None:
                 st.markdown(prompt)
 
             try:
-                if tables != "" and db._engine:
-                    response = graph.stream(
-                        input={"messages": st.session_state.messages},
+                if tables != "":
+                    tracer = RequestTracer()
+                    st.session_state.last_trace = tracer
+                    # USE_ASYNC_GRAPH runs the async nodes and tools, which offload
+                    # database work to the DB_THREADS pool.
+                    stream = (
+                        partial(astream_in_thread, load_graph())
+                        if os.getenv("USE_ASYNC_GRAPH") == "yes"
+                        else load_graph().stream
+                    )
+                    if load_graph().checkpointer:
+                        # Earlier turns are restored from the checkpoint.
+                        graph_input = turn_input(prompt)
+                        config = {"callbacks": [tracer], **thread_config}
+                    else:
+                        graph_input = {"messages": st.session_state.messages}
+                        config = {"callbacks": [tracer]}
+                    response = stream(
+                        input=graph_input,
+                        config=config,
                         stream_mode="messages",
                     )
+                    query_results = []
                     with message_container.chat_message("ai"):
-                        full_response = st.write_stream(stream_values(response))
+                        full_response = st.write_stream(
+                            stream_values(response, query_results)
+                        )
+                        # Small results already are the answer's markdown table.
+                        if (
+                            query_results
+                            and len(query_results[-1]["rows"]) > 1
+                            and full_response != format_result(query_results[-1])
+                        ):
+                            st.dataframe(
+                                pd.DataFrame(
+                                    query_results[-1]["rows"],
+                                    columns=query_results[-1]["columns"],
+                                ),
+                                hide_index=True,
+                            )
                         # full_response = final_answer
                         # st.markdown(response)
                 else:
@@ -151,6 +282,28 @@ def main() -> None:
                     {"role": "ai", "content": combined_response}
                 )
 
+    with col1.expander("Query cache statistics"):
+        st.json(query_cache.stats())
+
+    with col1.expander("Index advisor"):
+        st.write("Created indexes:")
+        st.dataframe(index_advisor.recommendations)
+        st.write("Planned indexes:")
+        st.dataframe(index_advisor.pending())
+
+    with col1.expander("Request breakdown"):
+        if "last_trace" in st.session_state:
+            trace = st.session_state.last_trace.to_dict()
+            st.write(
+                f"Total: {trace['seconds'] or 0:.2f}s, "
+                f"generate_query iterations: {trace['iterations']}"
+            )
+            st.dataframe(
+                pd.DataFrame(trace["spans"]).drop(columns=["start"], errors="ignore")
+            )
+        st.write("Prometheus metrics:")
+        st.code(metrics.render_prometheus())
+
 
 if __name__ == "__main__":
     main()
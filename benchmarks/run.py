@@ -0,0 +1,256 @@
+"""
+Offline end-to-end benchmarks of the SQL agent graph.
+
+Every scenario generates a synthetic database (benchmarks/synthetic_db.py) and
+runs ``graph.invoke`` against it in a fresh Python process, with the LLM replaced
+by the deterministic ScriptedChatModel (benchmarks/fake_llm.py). No API keys or
+network access are needed. The results are written to a JSON file so that runs
+can be compared across commits.
+
+Usage:
+    python -m benchmarks.run --rows 10 10000 1000000 --tables 5 50 --repeats 5
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import defaultdict
+from pathlib import Path
+
+from benchmarks.synthetic_db import generate_database, table_name
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def _questions(tables: int) -> list:
+    indexes = sorted({0, tables // 2, tables - 1})
+    return [f"How many rows are in {table_name(index)}?" for index in indexes]
+
+
+def _summarize_run(tracer, seconds: float) -> dict:
+    trace = tracer.to_dict()
+    nodes = defaultdict(float)
+    prompt_chars = defaultdict(int)
+    prompt_tokens = completion_tokens = 0
+    for span in trace["spans"]:
+        if span["kind"] != "node":
+            continue
+        nodes[span["name"]] += span["seconds"]
+        prompt_chars[span["name"]] += span["prompt_chars"]
+        prompt_tokens += span["prompt_tokens"]
+        completion_tokens += span["completion_tokens"]
+    return {
+        "seconds": seconds,
+        "iterations": trace["iterations"],
+        "node_seconds": dict(nodes),
+        "prompt_chars": dict(prompt_chars),
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+    }
+
+
+def _peak_rss_mb():
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere.
+    return peak / 1024**2 if sys.platform == "darwin" else peak / 1024
+
+
+def run_worker(args) -> None:
+    """
+    Runs the questions of one scenario in this process and writes the results to args.result.
+    """
+    started_at = time.perf_counter()
+    import src.llm
+    from benchmarks.fake_llm import ScriptedChatModel
+
+    model = ScriptedChatModel(latency_seconds=args.llm_latency)
+    # Must be replaced before src.chains is imported, which binds get_llm.
+    src.llm.get_llm = lambda: model
+
+    from src.agent import get_graph
+    from src.index_advisor import index_advisor
+    from src.tracing import RequestTracer
+
+    # Indexes created in the background would make repeats incomparable.
+    index_advisor.enabled = False
+    graph = get_graph()
+    import_seconds = time.perf_counter() - started_at
+
+    runs = []
+    for repeat in range(args.repeats):
+        for question in _questions(args.tables):
+            tracer = RequestTracer()
+            started_at = time.perf_counter()
+            graph.invoke(
+                {"messages": [("user", question)]}, config={"callbacks": [tracer]}
+            )
+            run = _summarize_run(tracer, time.perf_counter() - started_at)
+            run.update(question=question, repeat=repeat)
+            runs.append(run)
+
+    # Python heap peak of one more request, measured separately since tracemalloc
+    # slows execution down.
+    tracemalloc.start()
+    graph.invoke({"messages": [("user", _questions(args.tables)[0])]})
+    _, python_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    with open(args.result, "w", encoding="utf-8") as f:
+        json.dump(
+            {
+                "import_seconds": import_seconds,
+                "runs": runs,
+                "python_peak_mb": python_peak / 1024**2,
+                "peak_rss_mb": _peak_rss_mb(),
+                "llm_calls": model.calls,
+            },
+            f,
+        )
+
+
+def _percentile(values: list, percent: float) -> float:
+    values = sorted(values)
+    index = min(len(values) - 1, round(percent / 100 * (len(values) - 1)))
+    return values[index]
+
+
+def summarize(runs: list) -> dict:
+    """
+    Aggregates the runs of a scenario. Cold runs (first repeat) are reported
+    separately from warm runs, which hit the query cache and the SQL memo.
+    """
+    cold = [run for run in runs if run["repeat"] == 0]
+    warm = [run for run in runs if run["repeat"] > 0] or cold
+    nodes = defaultdict(list)
+    for run in cold:
+        for name, seconds in run["node_seconds"].items():
+            nodes[name].append(seconds)
+    return {
+        "cold_p50_seconds": _percentile([run["seconds"] for run in cold], 50),
+        "warm_p50_seconds": _percentile([run["seconds"] for run in warm], 50),
+        "warm_p95_seconds": _percentile([run["seconds"] for run in warm], 95),
+        "cold_node_p50_seconds": {
+            name: _percentile(values, 50) for name, values in sorted(nodes.items())
+        },
+        "cold_prompt_chars": statistics.mean(
+            sum(run["prompt_chars"].values()) for run in cold
+        ),
+        "cold_prompt_tokens": statistics.mean(run["prompt_tokens"] for run in cold),
+    }
+
+
+def run_scenario(rows: int, tables: int, args) -> dict:
+    """
+    Generates (or reuses) the database of a scenario and benchmarks it in a subprocess.
+    """
+    data_dir = Path(args.data_dir)
+    data_dir.mkdir(parents=True, exist_ok=True)
+    db_path = data_dir / f"synthetic_{rows}_{tables}.db"
+    if db_path.exists() and not args.regenerate:
+        database = {"path": str(db_path), "rows": rows, "tables": tables}
+        database["bytes"] = db_path.stat().st_size
+    else:
+        print(f"Generating {db_path} ({rows} rows, {tables} tables)")
+        database = generate_database(str(db_path), rows, tables, seed=args.seed)
+
+    env = dict(os.environ)
+    env["SQL_SAMPLE_DB_URI"] = f"sqlite:///{db_path.resolve()}"
+    for name in ("LLM_CACHE_PATH", "TRACE_JSONL_PATH", "PROMETHEUS_TEXTFILE_PATH"):
+        env.pop(name, None)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        result_path = os.path.join(tmp, "result.json")
+        command = [
+            sys.executable,
+            "-m",
+            "benchmarks.run",
+            "--worker",
+            "--result",
+            result_path,
+            "--tables",
+            str(tables),
+            "--repeats",
+            str(args.repeats),
+            "--llm-latency",
+            str(args.llm_latency),
+        ]
+        completed = subprocess.run(
+            command, cwd=ROOT, env=env, capture_output=not args.verbose, text=True
+        )
+        if completed.returncode != 0:
+            print(completed.stderr)
+            return {"database": database, "error": f"exit code {completed.returncode}"}
+        with open(result_path, encoding="utf-8") as f:
+            result = json.load(f)
+
+    return {"database": database, "summary": summarize(result["runs"]), **result}
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[10, 10000, 1000000])
+    parser.add_argument("--tables", type=int, nargs="+", default=[5, 50])
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--llm-latency",
+        type=float,
+        default=0.0,
+        help="Simulated seconds per LLM call.",
+    )
+    parser.add_argument("--data-dir", default=str(ROOT / "benchmarks" / "data"))
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--regenerate", action="store_true")
+    parser.add_argument("--verbose", action="store_true")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--result", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        args.tables = args.tables[0]
+        run_worker(args)
+        return
+
+    scenarios = []
+    for rows in args.rows:
+        for tables in args.tables:
+            if not 10 <= rows <= 10_000_000 or not 5 <= tables <= 500:
+                parser.error("rows must be in 10..10M and tables in 5..500")
+            print(f"Benchmarking {rows} rows / {tables} tables")
+            scenario = run_scenario(rows, tables, args)
+            scenarios.append({"rows": rows, "tables": tables, **scenario})
+            if "summary" in scenario:
+                summary = scenario["summary"]
+                print(
+                    f"  cold p50 {summary['cold_p50_seconds'] * 1000:.1f}ms, "
+                    f"warm p50 {summary['warm_p50_seconds'] * 1000:.1f}ms, "
+                    f"prompt {summary['cold_prompt_chars']:.0f} chars, "
+                    f"peak RSS {scenario['peak_rss_mb'] or 0:.0f}MB"
+                )
+
+    report = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "repeats": args.repeats,
+        "llm_latency": args.llm_latency,
+        "scenarios": scenarios,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
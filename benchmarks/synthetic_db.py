@@ -0,0 +1,100 @@
+import os
+import random
+import sqlite3
+import time
+from typing import Iterator
+
+CATEGORIES = ["north", "south", "east", "west", "online", "retail", "wholesale"]
+INSERT_BATCH_SIZE = 50000
+COLUMN_TYPES = {
+    "id": "INTEGER",
+    "category": "TEXT",
+    "label": "TEXT",
+    "amount": "REAL",
+    "created_at": "TEXT",
+    "parent_id": "INTEGER",
+}
+
+
+def table_name(index: int) -> str:
+    return f"t_{index:04d}"
+
+
+def _rows(rng: random.Random, count: int, parent_rows: int) -> Iterator[tuple]:
+    for row_id in range(1, count + 1):
+        yield (
+            row_id,
+            rng.choice(CATEGORIES),
+            f"item {rng.randrange(1000)}",
+            round(rng.uniform(1, 1000), 2),
+            f"2024-{rng.randrange(1, 13):02d}-{rng.randrange(1, 29):02d}",
+            rng.randrange(1, parent_rows + 1) if parent_rows else None,
+        )
+
+
+def generate_database(path: str, rows: int, tables: int, seed: int = 0) -> dict:
+    """
+    Creates a synthetic SQLite database for benchmarks.
+
+    The rows are spread evenly over the tables. Every table has the same layout
+    (an id, a low-cardinality category, a label, an amount, a date and a
+    reference to the previous table), so schema prompts grow linearly with the
+    number of tables. Column statistics are stored like ingestion does
+    (src/column_stats.py). The output is deterministic for a given seed.
+
+    Parameters:
+        path (str): Path of the database file. An existing file is replaced.
+        rows (int): Total number of rows.
+        tables (int): Number of tables.
+        seed (int): Seed of the random generator.
+
+    Returns:
+        dict: The path, row and table counts, file size and generation time.
+    """
+    # Imported here so that the benchmark worker, which only needs table_name,
+    # does not load pandas.
+    import pandas as pd
+
+    from src.column_stats import TableStats
+
+    started_at = time.perf_counter()
+    if os.path.exists(path):
+        os.remove(path)
+    rng = random.Random(seed)
+    conn = sqlite3.connect(path, isolation_level=None)
+    try:
+        conn.execute("PRAGMA journal_mode = OFF")
+        conn.execute("PRAGMA synchronous = OFF")
+        conn.execute("BEGIN")
+        parent_rows = 0
+        for index in range(tables):
+            count = rows // tables + (1 if index < rows % tables else 0)
+            name = table_name(index)
+            reference = f' REFERENCES "{table_name(index - 1)}" ("id")' if index else ""
+            conn.execute(
+                f'CREATE TABLE "{name}" ('
+                '"id" INTEGER PRIMARY KEY, "category" TEXT, "label" TEXT, '
+                f'"amount" REAL, "created_at" TEXT, "parent_id" INTEGER{reference})'
+            )
+            stats = TableStats(name, COLUMN_TYPES)
+            generator = _rows(rng, count, parent_rows)
+            while True:
+                batch = [row for _, row in zip(range(INSERT_BATCH_SIZE), generator)]
+                if not batch:
+                    break
+                conn.executemany(
+                    f'INSERT INTO "{name}" VALUES (?, ?, ?, ?, ?, ?)', batch
+                )
+                stats.update(pd.DataFrame(batch, columns=list(COLUMN_TYPES)))
+            stats.save(conn)
+            parent_rows = count
+        conn.execute("COMMIT")
+    finally:
+        conn.close()
+    return {
+        "path": path,
+        "rows": rows,
+        "tables": tables,
+        "bytes": os.path.getsize(path),
+        "seconds": time.perf_counter() - started_at,
+    }
@@ -1,3 +1,6 @@
+from functools import lru_cache
+
+from langchain_core.runnables import RunnableLambda
 from langgraph.graph import StateGraph, START, END
 
 
@@ -14,6 +17,13 @@ from src.nodes import (
     correct_query,
     give_final_answer,
     sql_agent,
+    use_cached_sql,
+    speculative_query,
+    aget_schema,
+    agenerate_query,
+    acorrect_query,
+    agive_final_answer,
+    aspeculative_query,
 )
 from src.tools import (
     list_tables_tool,
@@ -21,39 +31,81 @@ from src.tools import (
     create_tool_node_with_fallback,
     db_query_tool,
 )
-from src.routers import should_continue
+from src.routers import (
+    should_continue,
+    route_start,
+    after_execute_query,
+    route_query_entry,
+    after_speculative_query,
+)
 
-workflow = StateGraph(GraphState)
 
-# workflow.add_node("sql_agent", sql_agent)
-# workflow.set_entry_point("sql_agent")
-# workflow.add_edge("sql_agent", END)
+@lru_cache(maxsize=None)
+def get_graph(checkpointer: bool = False):
+    """
+    Builds and compiles the agent graph on first use.
 
-workflow.add_node("first_tool_call", first_tool_call)
-workflow.add_node(
-    "list_tables_tool", create_tool_node_with_fallback([list_tables_tool])
-)
-workflow.add_node("get_schema_tool", create_tool_node_with_fallback([get_schema_tool]))
-workflow.add_node("get_schema", get_schema)
-
-workflow.add_node("generate_query", generate_query)
-workflow.add_node("correct_query", correct_query)
-workflow.add_node("execute_query", create_tool_node_with_fallback([db_query_tool]))
-workflow.add_node("give_final_answer", give_final_answer)
-
-
-workflow.add_edge(START, "first_tool_call")
-workflow.add_edge("first_tool_call", "list_tables_tool")
-workflow.add_edge("list_tables_tool", "get_schema")
-workflow.add_edge("get_schema", "get_schema_tool")
-workflow.add_edge("get_schema_tool", "generate_query")
-workflow.add_conditional_edges(
-    "generate_query",
-    should_continue,
-)
-workflow.add_edge("correct_query", "execute_query")
-workflow.add_edge("execute_query", "generate_query")
+    The compiled graph is cached per process. It does not hold on to the
+    database or the LLM, which are resolved lazily by the nodes and tools.
+    The nodes that call the LLM or the database also have async versions, used
+    by ``ainvoke``/``astream``.
+
+    With ``checkpointer`` the state of each conversation is persisted (see
+    src/checkpoints.py), so every invocation needs a ``thread_id`` in its
+    config and only sends the new message (``src.state.turn_input``).
+    """
+    workflow = StateGraph(GraphState)
+
+    # workflow.add_node("sql_agent", sql_agent)
+    # workflow.set_entry_point("sql_agent")
+    # workflow.add_edge("sql_agent", END)
+
+    workflow.add_node("use_cached_sql", use_cached_sql)
+    workflow.add_node("first_tool_call", first_tool_call)
+    workflow.add_node(
+        "list_tables_tool", create_tool_node_with_fallback([list_tables_tool])
+    )
+    workflow.add_node(
+        "get_schema_tool", create_tool_node_with_fallback([get_schema_tool])
+    )
+    workflow.add_node("get_schema", RunnableLambda(get_schema, afunc=aget_schema))
+
+    workflow.add_node(
+        "speculative_query", RunnableLambda(speculative_query, afunc=aspeculative_query)
+    )
+    workflow.add_node(
+        "generate_query", RunnableLambda(generate_query, afunc=agenerate_query)
+    )
+    workflow.add_node(
+        "correct_query", RunnableLambda(correct_query, afunc=acorrect_query)
+    )
+    workflow.add_node("execute_query", create_tool_node_with_fallback([db_query_tool]))
+    workflow.add_node(
+        "give_final_answer", RunnableLambda(give_final_answer, afunc=agive_final_answer)
+    )
+
+    workflow.add_conditional_edges(START, route_start)
+    workflow.add_edge("use_cached_sql", "execute_query")
+    workflow.add_edge("first_tool_call", "list_tables_tool")
+    workflow.add_edge("list_tables_tool", "get_schema")
+    workflow.add_edge("get_schema", "get_schema_tool")
+    workflow.add_conditional_edges(
+        "get_schema_tool",
+        route_query_entry,
+        path_map=["speculative_query", "generate_query"],
+    )
+    workflow.add_conditional_edges("speculative_query", after_speculative_query)
+    workflow.add_conditional_edges(
+        "generate_query",
+        should_continue,
+    )
+    workflow.add_edge("correct_query", "execute_query")
+    workflow.add_conditional_edges("execute_query", after_execute_query)
+
+    workflow.add_edge("give_final_answer", END)
 
-workflow.add_edge("give_final_answer", END)
+    if checkpointer:
+        from src.checkpoints import get_checkpointer
 
-graph = workflow.compile()
+        return workflow.compile(checkpointer=get_checkpointer())
+    return workflow.compile()
@@ -0,0 +1,183 @@
+"""
+Runs a file of questions through the agent graph without the Streamlit UI.
+
+Questions are read from a JSONL file, one object per line with a "question"
+and an optional "id", and run concurrently with ``graph.batch`` or
+``graph.abatch``. Answers, the SQL that produced them and per-question timings
+are written to a JSONL file, and throughput and p50/p95 latency are reported
+at the end.
+
+Usage:
+    python -m src.batch questions.jsonl --output answers.jsonl --concurrency 8
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import time
+from typing import List, Optional
+
+from dotenv import load_dotenv, find_dotenv
+
+load_dotenv(find_dotenv(), override=True)
+
+from src.agent import get_graph
+from src.nodes import last_successful_query
+from src.tracing import RequestTracer
+
+
+def read_questions(path: str) -> List[dict]:
+    """
+    Reads the questions of a JSONL file. Blank lines are skipped.
+
+    Parameters:
+        path (str): Path to the JSONL file.
+
+    Returns:
+        list: The questions as dicts with an "id" (the line number if missing) and a "question".
+    """
+    questions = []
+    with open(path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            if isinstance(item, str):
+                item = {"question": item}
+            item.setdefault("id", line_number)
+            questions.append(item)
+    return questions
+
+
+def _percentile(values: list, percent: float) -> float:
+    values = sorted(values)
+    index = min(len(values) - 1, round(percent / 100 * (len(values) - 1)))
+    return values[index]
+
+
+def _result(item: dict, output, tracer: RequestTracer) -> dict:
+    trace = tracer.to_dict()
+    result = {
+        "id": item["id"],
+        "question": item["question"],
+        "answer": None,
+        "sql": None,
+        "seconds": trace["seconds"],
+        "iterations": trace["iterations"],
+    }
+    if isinstance(output, Exception):
+        result["error"] = repr(output)
+        return result
+    messages = output["messages"]
+    successful_query = last_successful_query(messages)
+    result.update(
+        answer=messages[-1].content,
+        sql=successful_query[0] if successful_query else None,
+        attempts=output.get("attempts"),
+        tokens_used=output.get("tokens_used"),
+    )
+    return result
+
+
+def run_batch(
+    questions: List[dict], concurrency: int = 4, mode: str = "abatch"
+) -> List[dict]:
+    """
+    Runs the questions through the graph, each as an independent conversation.
+
+    Parameters:
+        questions (list): Questions as returned by ``read_questions``.
+        concurrency (int): Maximum number of questions running at the same time.
+        mode (str): "abatch" (async graph, see DB_THREADS), "batch" (thread
+            pool) or "invoke" (one question at a time).
+
+    Returns:
+        list: One result dict per question, in input order.
+    """
+    graph = get_graph()
+    tracers = [RequestTracer() for _ in questions]
+    inputs = [{"messages": [("user", item["question"])]} for item in questions]
+    configs = [
+        {"callbacks": [tracer], "max_concurrency": concurrency} for tracer in tracers
+    ]
+
+    if mode == "invoke":
+        outputs = []
+        for graph_input, config in zip(inputs, configs):
+            try:
+                outputs.append(graph.invoke(graph_input, config=config))
+            except Exception as e:
+                outputs.append(e)
+    elif mode == "batch":
+        outputs = graph.batch(inputs, config=configs, return_exceptions=True)
+    else:
+        outputs = asyncio.run(
+            graph.abatch(inputs, config=configs, return_exceptions=True)
+        )
+    return [
+        _result(item, output, tracer)
+        for item, output, tracer in zip(questions, outputs, tracers)
+    ]
+
+
+def summarize(results: List[dict], seconds: float) -> dict:
+    """
+    Computes throughput and latency percentiles of a batch run.
+
+    Parameters:
+        results (list): Results returned by ``run_batch``.
+        seconds (float): Wall-clock seconds of the whole run.
+
+    Returns:
+        dict: Question and error counts, throughput and p50/p95 latency.
+    """
+    latencies = [r["seconds"] for r in results if r["seconds"] is not None]
+    return {
+        "questions": len(results),
+        "errors": sum(1 for r in results if "error" in r),
+        "seconds": seconds,
+        "questions_per_second": len(results) / seconds if seconds else 0.0,
+        "p50_seconds": _percentile(latencies, 50) if latencies else None,
+        "p95_seconds": _percentile(latencies, 95) if latencies else None,
+    }
+
+
+def main(argv: Optional[list] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("input", help="JSONL file of questions.")
+    parser.add_argument("--output", default="batch_results.jsonl")
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=int(os.getenv("BATCH_CONCURRENCY", "4")),
+        help="Maximum number of questions running at the same time.",
+    )
+    parser.add_argument(
+        "--mode", choices=["abatch", "batch", "invoke"], default="abatch"
+    )
+    args = parser.parse_args(argv)
+
+    questions = read_questions(args.input)
+    if not questions:
+        parser.error(f"no questions in {args.input}")
+    print(
+        f"Running {len(questions)} questions ({args.mode}, concurrency {args.concurrency})"
+    )
+    started_at = time.perf_counter()
+    results = run_batch(questions, args.concurrency, args.mode)
+    summary = summarize(results, time.perf_counter() - started_at)
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        for result in results:
+            f.write(json.dumps(result, default=str) + "\n")
+    print(f"Results written to {args.output}")
+    print(
+        f"{summary['questions']} questions ({summary['errors']} errors) in "
+        f"{summary['seconds']:.2f}s: {summary['questions_per_second']:.2f} questions/s, "
+        f"p50 {summary['p50_seconds'] or 0:.2f}s, p95 {summary['p95_seconds'] or 0:.2f}s"
+    )
+
+
+if __name__ == "__main__":
+    main()
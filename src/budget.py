@@ -0,0 +1,71 @@
+import math
+import os
+import time
+from typing import Optional
+
+from langchain_core.messages import BaseMessage
+
+
+def start_budget(state) -> dict:
+    """
+    Starts the attempt, deadline and token budget of a request, unless it is already running.
+
+    Parameters:
+        state (GraphState): The graph state.
+
+    Returns:
+        dict: State update with the initial budget, or an empty dict.
+    """
+    if state.get("deadline"):
+        return {}
+    deadline_seconds = float(os.getenv("AGENT_DEADLINE_SECONDS", "60"))
+    return {
+        "attempts": 0,
+        "tokens_used": 0,
+        "deadline": time.time() + deadline_seconds if deadline_seconds else math.inf,
+    }
+
+
+def count_tokens(state, *messages: BaseMessage) -> int:
+    """
+    Adds the token usage reported for LLM responses to the tokens used so far.
+
+    Parameters:
+        state (GraphState): The graph state.
+        messages (BaseMessage): LLM responses produced by the current node.
+
+    Returns:
+        int: Total number of tokens used by the request.
+    """
+    tokens_used = state.get("tokens_used") or 0
+    for message in messages:
+        usage = getattr(message, "usage_metadata", None) or {}
+        tokens_used += usage.get("total_tokens", 0)
+    return tokens_used
+
+
+def budget_exhausted(state) -> Optional[str]:
+    """
+    Checks the request budget: executed queries (AGENT_MAX_ATTEMPTS), wall-clock
+    deadline (AGENT_DEADLINE_SECONDS) and LLM tokens (AGENT_MAX_TOKENS). A limit
+    of 0 disables it.
+
+    Parameters:
+        state (GraphState): The graph state.
+
+    Returns:
+        str or None: Description of the exhausted limit, or None if budget is left.
+    """
+    max_attempts = int(os.getenv("AGENT_MAX_ATTEMPTS", "5"))
+    max_tokens = int(os.getenv("AGENT_MAX_TOKENS", "0"))
+    attempts = state.get("attempts") or 0
+    tokens_used = state.get("tokens_used") or 0
+    deadline = state.get("deadline") or math.inf
+
+    if max_attempts and attempts >= max_attempts:
+        return f"the limit of {max_attempts} query attempts was reached"
+    if time.time() > deadline:
+        return "the time limit for the request was reached"
+    if max_tokens and tokens_used >= max_tokens:
+        return f"the limit of {max_tokens} LLM tokens was reached"
+    return None
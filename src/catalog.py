@@ -0,0 +1,191 @@
+import os
+import threading
+from typing import Dict, List, Optional
+
+from langchain_community.utilities import SQLDatabase
+
+from src.db import get_db, get_pool
+from src.column_stats import STATS_TABLE, read_column_stats, render_schema
+
+
+class SchemaCatalog:
+    """
+    Caches table names, DDL and sample rows of a SQLite database, and the column
+    statistics stored at ingestion (src/column_stats.py).
+
+    Entries are keyed on ``schema_key``: the database connection plus SQLite's
+    ``PRAGMA schema_version``, which is bumped whenever a table is created,
+    altered or dropped, so the (fairly expensive) schema reflection only runs
+    again after the schema actually changes. The connection is part of the key
+    because a database deleted and uploaded again starts over at the same
+    schema versions. Schema versions bumped only by an added index (see
+    ``index_created``) keep the key of the version before them.
+    """
+
+    def __init__(self, database: Optional[SQLDatabase] = None):
+        self._source = database
+        self._lock = threading.Lock()
+        self._key: Optional[tuple] = None
+        self._database: Optional[SQLDatabase] = None
+        self._table_names: List[str] = []
+        self._table_info: Dict[str, str] = {}
+        self._column_stats: Dict[str, List[dict]] = {}
+        # (engine, schema version) -> the earlier schema version it is equivalent to.
+        self._equivalent_versions: Dict[tuple, int] = {}
+
+    @property
+    def _engine(self):
+        # Resolved on every use, so the catalog follows get_db() after reset_db().
+        return (self._source or get_db())._engine
+
+    def schema_version(self) -> int:
+        """
+        Reads the current schema version of the database.
+
+        Returns:
+            int: Value of ``PRAGMA schema_version``.
+        """
+        with self._engine.connect() as conn:
+            return conn.exec_driver_sql("PRAGMA schema_version").scalar()
+
+    def schema_key(self) -> tuple:
+        """
+        Identifies the current schema of the current database. Caches derived
+        from the schema (retriever index, SQL memo) compare it instead of the
+        bare schema version.
+
+        Returns:
+            tuple: The database engine and its schema version.
+        """
+        engine = self._engine
+        with engine.connect() as conn:
+            version = conn.exec_driver_sql("PRAGMA schema_version").scalar()
+        return (engine, self._equivalent_versions.get((engine, version), version))
+
+    def index_created(self, version_before: int, version_after: int) -> None:
+        """
+        Records that the schema only changed by an added index. Indexes do not
+        change tables, columns or data, so the caches keyed on the schema before
+        the index stay valid and are not rebuilt.
+
+        Parameters:
+            version_before (int): Schema version before CREATE INDEX.
+            version_after (int): Schema version after CREATE INDEX.
+
+        Returns:
+            None
+        """
+        engine = self._engine
+        self._equivalent_versions[(engine, version_after)] = (
+            self._equivalent_versions.get((engine, version_before), version_before)
+        )
+
+    def reset(self) -> None:
+        """
+        Drops the cached schema, e.g. after the database was deleted.
+        """
+        with self._lock:
+            self._key = None
+            self._database = None
+            self._table_names = []
+            self._table_info = {}
+            self._column_stats = {}
+            self._equivalent_versions = {}
+
+    def _refresh(self) -> SQLDatabase:
+        key = self.schema_key()
+        if key != self._key or self._database is None:
+            print(f"Refreshing schema catalog (schema_version={key[1]})")
+            # SQLDatabase reflects the table list on construction, so a new
+            # instance is needed to pick up tables added since the last refresh.
+            source = self._source or get_db()
+            with get_pool(self._engine.url.database).reader() as conn:
+                column_stats = read_column_stats(conn)
+            self._database = SQLDatabase(
+                engine=source._engine,
+                sample_rows_in_table_info=source._sample_rows_in_table_info,
+                # SQLDatabase rejects ignored tables that do not exist.
+                ignore_tables=[STATS_TABLE] if column_stats else None,
+            )
+            self._table_names = self._database.get_usable_table_names()
+            self._column_stats = column_stats
+            self._table_info = {}
+            self._key = key
+        return self._database
+
+    def is_warm(self) -> bool:
+        """
+        Checks whether the cached schema matches the current database schema.
+
+        Returns:
+            bool: True if the cache can be used without reflecting the schema again.
+        """
+        return self._database is not None and self._key == self.schema_key()
+
+    def get_usable_table_names(self) -> List[str]:
+        """
+        Returns the names of the tables in the database.
+
+        Returns:
+            list: Sorted list of table names.
+        """
+        with self._lock:
+            self._refresh()
+            return list(self._table_names)
+
+    def get_table_info(self, table_names: Optional[List[str]] = None) -> str:
+        """
+        Describes the given tables for the prompts.
+
+        With SCHEMA_RENDERING=stats (the default), tables ingested with column
+        statistics are rendered compactly from them (types, nulls, ranges,
+        distinct counts and top values) within SCHEMA_TOKEN_BUDGET. Other tables,
+        or all tables with SCHEMA_RENDERING=sample_rows, get the DDL and sample
+        rows of ``SQLDatabase.get_table_info``.
+
+        Parameters:
+            table_names (list or None): Tables to describe. Pass None for all tables.
+
+        Returns:
+            str: Table descriptions.
+        """
+        with self._lock:
+            database = self._refresh()
+            if table_names is None:
+                table_names = self._table_names
+            missing_tables = set(table_names).difference(self._table_names)
+            if missing_tables:
+                raise ValueError(f"table_names {missing_tables} not found in database")
+
+            column_stats = {}
+            if os.getenv("SCHEMA_RENDERING", "stats") == "stats":
+                column_stats = {
+                    t: self._column_stats[t]
+                    for t in sorted(table_names)
+                    if t in self._column_stats
+                }
+            for table_name in table_names:
+                if (
+                    table_name not in column_stats
+                    and table_name not in self._table_info
+                ):
+                    self._table_info[table_name] = database.get_table_info([table_name])
+            table_info = sorted(
+                self._table_info[t] for t in table_names if t not in column_stats
+            )
+            if column_stats:
+                table_info.insert(0, render_schema(column_stats))
+            return "\n\n".join(table_info)
+
+    def get_table_info_no_throw(self, table_names: Optional[List[str]] = None) -> str:
+        """
+        Same as ``get_table_info`` but returns errors as a string.
+        """
+        try:
+            return self.get_table_info(table_names)
+        except ValueError as e:
+            return f"Error: {e}"
+
+
+# Connects to the database on first use, not on import.
+catalog = SchemaCatalog()
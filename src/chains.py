@@ -1,4 +1,4 @@
-from langchain_community.agent_toolkits import create_sql_agent
+from functools import lru_cache
 from typing import List
 from operator import itemgetter
 from dotenv import load_dotenv, find_dotenv
@@ -12,37 +12,76 @@ from src.prompts import (
     category_system_prompt,
     category_prompt,
     final_answer_prompt,
+    query_candidates_prompt,
 )
-from src.llm import llm
+from src.llm import get_llm
 from src.tools import db_query_tool, get_schema_tool
-from src.schema import SubmitFinalAnswer
+from src.schema import SubmitFinalAnswer, SQLCandidates
 from src.schema import Table, Tables
-from src.db import db
-
-
-from langchain.chains.openai_tools import create_extraction_chain_pydantic
+from src.db import get_db
 
 
 def get_table_names(tables: List[Table]) -> List[str]:
     return [table.name for table in tables]
 
 
+# The chains are built on first use and cached, so importing this module neither
+# creates the LLM client nor connects to the database. run_name gives each chain
+# its own span in src/tracing.py.
+
+
 # category_chain = create_extraction_chain_pydantic(
 #     pydantic_schemas=Table, llm=llm, system_message=category_system_prompt
 # )
 # table_chain = {"input": itemgetter("question")} | category_chain | get_table_names
-table_chain = category_prompt | llm.with_structured_output(schema=Tables)
+@lru_cache(maxsize=None)
+def get_table_chain():
+    return (
+        category_prompt | get_llm().with_structured_output(schema=Tables)
+    ).with_config(run_name="table_chain")
 
 
-query_checker_chain = query_checker_prompt | llm.bind_tools(
-    [db_query_tool], tool_choice="required"
-)
+@lru_cache(maxsize=None)
+def get_query_checker_chain():
+    return (
+        query_checker_prompt
+        | get_llm().bind_tools([db_query_tool], tool_choice="required")
+    ).with_config(run_name="query_checker_chain")
+
+
+@lru_cache(maxsize=None)
+def get_schema_tool_chain():
+    return (
+        get_llm().bind_tools([get_schema_tool]).with_config(run_name="get_schema_chain")
+    )
+
+
+@lru_cache(maxsize=None)
+def get_query_generator_chain():
+    return (
+        query_generator_prompt | get_llm().bind_tools([SubmitFinalAnswer])
+    ).with_config(run_name="query_generator_chain")
+
+
+@lru_cache(maxsize=None)
+def get_query_candidates_chain():
+    # include_raw keeps the AIMessage, whose usage metadata counts against the token budget.
+    return (
+        query_candidates_prompt
+        | get_llm().with_structured_output(schema=SQLCandidates, include_raw=True)
+    ).with_config(run_name="query_candidates_chain")
 
-get_schema_chain = llm.bind_tools([get_schema_tool])
 
-query_generator_chain = query_generator_prompt | llm.bind_tools([SubmitFinalAnswer])
+@lru_cache(maxsize=None)
+def get_final_answer_chain():
+    return (final_answer_prompt | get_llm()).with_config(run_name="final_answer_chain")
 
-final_answer_chain = final_answer_prompt | llm
 
+@lru_cache(maxsize=None)
+def get_sql_agent_exec():
+    # Only used by the (disabled) sql_agent node; the toolkit import is slow.
+    from langchain_community.agent_toolkits import create_sql_agent
 
-sql_agent_exec = create_sql_agent(llm, db=db, agent_type="tool-calling", verbose=False)
+    return create_sql_agent(
+        get_llm(), db=get_db(), agent_type="tool-calling", verbose=False
+    )
@@ -0,0 +1,150 @@
+import asyncio
+import os
+import sqlite3
+from functools import lru_cache
+from typing import Any, AsyncIterator, Dict, Optional, Sequence, Tuple
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+)
+from langgraph.checkpoint.sqlite import SqliteSaver
+
+
+class PrunedSqliteSaver(SqliteSaver):
+    """
+    SqliteSaver that keeps the store small and also works with the async graph.
+
+    Only the latest ``keep_checkpoints`` checkpoints of a thread are kept, since
+    a conversation only resumes from its latest one. When a new thread starts,
+    the least recently used threads past ``max_threads`` are deleted. The async
+    methods run the sync ones in a worker thread; writes are serialized by the
+    saver's lock either way.
+    """
+
+    def __init__(
+        self, conn: sqlite3.Connection, keep_checkpoints: int = 5, max_threads: int = 0
+    ):
+        super().__init__(conn)
+        self.keep_checkpoints = keep_checkpoints
+        self.max_threads = max_threads
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        new_config = super().put(config, checkpoint, metadata, new_versions)
+        thread_id = new_config["configurable"]["thread_id"]
+        self.prune_thread(thread_id)
+        if not config["configurable"].get("checkpoint_id"):
+            # First checkpoint of a thread.
+            self.prune_threads()
+        return new_config
+
+    def prune_thread(self, thread_id: str) -> None:
+        """
+        Deletes all but the latest ``keep_checkpoints`` checkpoints of a thread and their writes.
+        """
+        if not self.keep_checkpoints:
+            return
+        with self.cursor() as cur:
+            # Checkpoint ids are time-ordered (uuid6), so the newest sort last.
+            cur.execute(
+                """
+                SELECT checkpoint_id FROM checkpoints WHERE thread_id = ?
+                ORDER BY checkpoint_id DESC LIMIT 1 OFFSET ?
+                """,
+                (thread_id, self.keep_checkpoints - 1),
+            )
+            row = cur.fetchone()
+            if row is None:
+                return
+            for table in ("checkpoints", "writes"):
+                cur.execute(
+                    f"DELETE FROM {table} WHERE thread_id = ? AND checkpoint_id < ?",
+                    (thread_id, row[0]),
+                )
+
+    def prune_threads(self) -> None:
+        """
+        Deletes the threads with the oldest latest checkpoint past ``max_threads``.
+        """
+        if not self.max_threads:
+            return
+        with self.cursor() as cur:
+            cur.execute(
+                """
+                SELECT thread_id FROM checkpoints GROUP BY thread_id
+                ORDER BY MAX(checkpoint_id) DESC LIMIT -1 OFFSET ?
+                """,
+                (self.max_threads,),
+            )
+            stale = [(thread_id,) for (thread_id,) in cur.fetchall()]
+            for table in ("checkpoints", "writes"):
+                cur.executemany(f"DELETE FROM {table} WHERE thread_id = ?", stale)
+        if stale:
+            print(f"Pruned {len(stale)} conversation threads")
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        checkpoints = await asyncio.to_thread(
+            lambda: list(self.list(config, filter=filter, before=before, limit=limit))
+        )
+        for checkpoint in checkpoints:
+            yield checkpoint
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        return await asyncio.to_thread(
+            self.put, config, checkpoint, metadata, new_versions
+        )
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+    ) -> None:
+        await asyncio.to_thread(self.put_writes, config, writes, task_id)
+
+
+@lru_cache(maxsize=None)
+def get_checkpointer() -> Optional[PrunedSqliteSaver]:
+    """
+    Returns the checkpointer that persists conversation state to CHECKPOINT_DB_PATH.
+
+    The checkpoints live in their own SQLite file, apart from the data being
+    queried, so deleting the data does not delete the conversations.
+
+    Returns:
+        PrunedSqliteSaver or None: The checkpointer, or None if CHECKPOINT_DB_PATH is empty.
+    """
+    path = os.getenv("CHECKPOINT_DB_PATH", "checkpoints.db")
+    if not path:
+        return None
+    print(f"Persisting conversation state to {path}")
+    return PrunedSqliteSaver(
+        sqlite3.connect(path, check_same_thread=False),
+        keep_checkpoints=int(os.getenv("CHECKPOINT_KEEP_PER_THREAD", "5")),
+        max_threads=int(os.getenv("CHECKPOINT_MAX_THREADS", "100")),
+    )
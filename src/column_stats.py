@@ -0,0 +1,278 @@
+import json
+import os
+import re
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+# Metadata table written next to the ingested tables; hidden from the schema catalog.
+STATS_TABLE = "_column_stats"
+# Past this many distinct values only a lower bound is kept and top values are dropped.
+MAX_TRACKED_DISTINCT = 10000
+TOP_K = 5
+MIN_TOP_VALUES_SHARE = 0.2
+# Characters kept per value in the rendered schema.
+MAX_VALUE_LENGTH = 30
+
+
+def _plain(value: Any) -> Any:
+    # numpy scalars -> Python scalars, timestamps and other objects -> str.
+    if hasattr(value, "item"):
+        value = value.item()
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    return str(value)
+
+
+class ColumnStats:
+    """
+    Statistics of one column, accumulated chunk by chunk: null count, min and
+    max, distinct count and most frequent values.
+    """
+
+    def __init__(self, name: str, sqlite_type: str):
+        self.name = name
+        self.sqlite_type = sqlite_type
+        self.row_count = 0
+        self.null_count = 0
+        self.min_value = None
+        self.max_value = None
+        self.ordered = True
+        self.counts: Optional[Counter] = Counter()
+
+    def update(self, values) -> None:
+        """
+        Adds a chunk of values (a pandas Series).
+        """
+        non_null = values.dropna()
+        self.row_count += len(values)
+        self.null_count += len(values) - len(non_null)
+        if not len(non_null):
+            return
+        if self.ordered:
+            try:
+                low, high = _plain(non_null.min()), _plain(non_null.max())
+                if self.min_value is None or low < self.min_value:
+                    self.min_value = low
+                if self.max_value is None or high > self.max_value:
+                    self.max_value = high
+            except TypeError:
+                # Mixed types have no order.
+                self.ordered = False
+                self.min_value = self.max_value = None
+        if self.counts is not None:
+            self.counts.update(non_null.value_counts().to_dict())
+            if len(self.counts) > MAX_TRACKED_DISTINCT:
+                self.counts = None
+
+    def retype(self, sqlite_type: str) -> None:
+        """
+        Follows a column widened during ingestion. Numbers widened to REAL keep
+        their statistics; values widened to TEXT are counted as their text, and
+        min and max are dropped since numbers and text have no common order.
+        """
+        if sqlite_type == "TEXT" and self.sqlite_type != "TEXT":
+            self.ordered = False
+            self.min_value = self.max_value = None
+            if self.counts is not None:
+                counts = Counter()
+                for value, n in self.counts.items():
+                    counts[str(value)] += n
+                self.counts = counts
+        self.sqlite_type = sqlite_type
+
+    def to_row(self, table_name: str, position: int) -> tuple:
+        distinct = len(self.counts) if self.counts is not None else None
+        top_values = None
+        non_null = self.row_count - self.null_count
+        if self.counts is not None and distinct < non_null:
+            top = self.counts.most_common(TOP_K)
+            # Top values only help for categorical columns, i.e. when they cover
+            # a good share of the rows, not for keys, measures or free text.
+            if sum(n for _, n in top) >= MIN_TOP_VALUES_SHARE * non_null:
+                top_values = json.dumps([[_plain(v), n] for v, n in top], default=str)
+        return (
+            table_name,
+            self.name,
+            position,
+            self.sqlite_type,
+            self.row_count,
+            self.null_count / self.row_count if self.row_count else 0.0,
+            self.min_value,
+            self.max_value,
+            distinct,
+            top_values,
+        )
+
+
+class TableStats:
+    """
+    Accumulates column statistics of a table in the same pass that writes it.
+    """
+
+    def __init__(self, table_name: str, column_types: Dict[str, str]):
+        self.table_name = table_name
+        self.columns = [ColumnStats(name, t) for name, t in column_types.items()]
+
+    def update(self, chunk) -> None:
+        for column in self.columns:
+            column.update(chunk[column.name])
+
+    def retype(self, column_types: Dict[str, str]) -> None:
+        """
+        Follows columns widened during ingestion.
+        """
+        for column in self.columns:
+            column.retype(column_types[column.name])
+
+    def save(self, conn) -> None:
+        """
+        Replaces the statistics of the table in the metadata table. Runs on the
+        ingestion connection, inside its transaction.
+        """
+        conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS "{STATS_TABLE}" (
+                table_name TEXT NOT NULL,
+                column_name TEXT NOT NULL,
+                position INTEGER,
+                type TEXT,
+                row_count INTEGER,
+                null_fraction REAL,
+                min_value,
+                max_value,
+                distinct_count INTEGER,
+                top_values TEXT,
+                PRIMARY KEY (table_name, column_name)
+            )
+            """)
+        conn.execute(
+            f'DELETE FROM "{STATS_TABLE}" WHERE table_name = ?', (self.table_name,)
+        )
+        conn.executemany(
+            f'INSERT INTO "{STATS_TABLE}" VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            [
+                column.to_row(self.table_name, position)
+                for position, column in enumerate(self.columns)
+            ],
+        )
+
+
+def read_column_stats(conn) -> Dict[str, List[dict]]:
+    """
+    Reads the stored column statistics.
+
+    Parameters:
+        conn: A DB-API connection to the database.
+
+    Returns:
+        dict: Column statistics per table name, in column order. Empty if no
+            table was ingested with statistics.
+    """
+    cursor = conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name = ?",
+        (STATS_TABLE,),
+    )
+    if cursor.fetchone() is None:
+        return {}
+    cursor = conn.execute(
+        f'SELECT * FROM "{STATS_TABLE}" ORDER BY table_name, position'
+    )
+    names = [column[0] for column in cursor.description]
+    stats = {}
+    for row in cursor.fetchall():
+        column = dict(zip(names, row))
+        column["top_values"] = json.loads(column["top_values"] or "null")
+        stats.setdefault(column["table_name"], []).append(column)
+    return stats
+
+
+def _short(value: Any) -> str:
+    text = repr(value) if isinstance(value, str) else str(value)
+    return (
+        text if len(text) <= MAX_VALUE_LENGTH else text[: MAX_VALUE_LENGTH - 3] + "..."
+    )
+
+
+def _identifier(name: str) -> str:
+    return name if re.fullmatch(r"[A-Za-z_]\w*", name) else f'"{name}"'
+
+
+def render_column(column: dict, detail: int) -> str:
+    """
+    Renders one column. ``detail`` 0 gives name and type, 1 adds distinct count,
+    nulls and range, 2 lists the most frequent values of categorical columns
+    instead of their range.
+    """
+    line = f"  {_identifier(column['column_name'])} {column['type']}"
+    if detail < 1:
+        return line
+    hints = []
+    distinct = column["distinct_count"]
+    non_null = column["row_count"] * (1 - column["null_fraction"])
+    if not round(non_null):
+        return f"{line}: always null"
+    if distinct is None:
+        hints.append(f"over {MAX_TRACKED_DISTINCT} distinct")
+    elif distinct >= round(non_null):
+        hints.append("unique")
+    else:
+        hints.append(f"{distinct} distinct")
+    if column["null_fraction"]:
+        hints.append(f"{column['null_fraction']:.0%} null")
+    if detail >= 2 and column["top_values"]:
+        values = ", ".join(_short(v) for v, _ in column["top_values"])
+        more = (
+            ", ..." if distinct is None or distinct > len(column["top_values"]) else ""
+        )
+        hints.append(f"values {values}{more}")
+    elif column["min_value"] is not None and column["min_value"] != column["max_value"]:
+        hints.append(f"{_short(column['min_value'])}..{_short(column['max_value'])}")
+    return f"{line}: {', '.join(hints)}"
+
+
+def render_table(table_name: str, columns: List[dict], detail: int) -> str:
+    row_count = columns[0]["row_count"] if columns else 0
+    lines = [f"Table {_identifier(table_name)} ({row_count} rows):"]
+    lines += [render_column(column, detail) for column in columns]
+    return "\n".join(lines)
+
+
+def render_schema(
+    stats: Dict[str, List[dict]], token_budget: Optional[int] = None
+) -> str:
+    """
+    Renders tables from their column statistics, as compact as the token budget requires.
+
+    All tables are rendered at the highest level of detail that fits
+    ``token_budget`` (about four characters per token): with top values, then
+    without, then names and types only. Tables that still do not fit are left
+    out and listed by name.
+
+    Parameters:
+        stats (dict): Column statistics per table, as returned by ``read_column_stats``.
+        token_budget (int or None): Token budget. Defaults to SCHEMA_TOKEN_BUDGET, 0 means unlimited.
+
+    Returns:
+        str: The rendered tables.
+    """
+    if token_budget is None:
+        token_budget = int(os.getenv("SCHEMA_TOKEN_BUDGET", "1500"))
+    max_chars = token_budget * 4 if token_budget else None
+    rendered = ""
+    for detail in (2, 1, 0):
+        rendered = "\n\n".join(
+            render_table(table_name, columns, detail)
+            for table_name, columns in stats.items()
+        )
+        if max_chars is None or len(rendered) <= max_chars:
+            return rendered
+
+    tables, size, left_out = [], 0, []
+    for table_name, columns in stats.items():
+        text = render_table(table_name, columns, 0)
+        if size + len(text) + 2 > max_chars:
+            left_out.append(table_name)
+            continue
+        tables.append(text)
+        size += len(text) + 2
+    tables.append(f"Other tables (not shown): {', '.join(left_out)}")
+    return "\n\n".join(tables)
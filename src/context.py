@@ -0,0 +1,182 @@
+import os
+from typing import List, Optional
+
+from langchain_core.messages import (
+    AIMessage,
+    BaseMessage,
+    HumanMessage,
+    SystemMessage,
+    ToolMessage,
+)
+
+SCHEMA_TOOLS = {"sql_db_schema"}
+# Characters kept per question / answer / error in the summary of dropped messages.
+SUMMARY_TEXT_LENGTH = 200
+
+
+def estimate_tokens(message: BaseMessage) -> int:
+    """
+    Roughly estimates the number of tokens of a message (about four characters per token).
+
+    Parameters:
+        message (BaseMessage): The message.
+
+    Returns:
+        int: Estimated number of tokens.
+    """
+    size = len(str(message.content))
+    if isinstance(message, AIMessage) and message.tool_calls:
+        size += len(str(message.tool_calls))
+    # A few tokens of per-message overhead (role, separators).
+    return size // 4 + 4
+
+
+def _shorten(text, length: int = SUMMARY_TEXT_LENGTH) -> str:
+    text = " ".join(str(text).split())
+    return text if len(text) <= length else text[: length - 3] + "..."
+
+
+def split_exchanges(messages: List[BaseMessage]) -> List[List[BaseMessage]]:
+    """
+    Groups the messages of a turn into exchanges that are kept or dropped together.
+
+    An exchange starts with an AIMessage and holds the ToolMessages answering its
+    tool calls, so a tool call is never separated from its result. A generated
+    query (an AIMessage without tool calls) is grouped with the db_query_tool
+    call that executes it.
+
+    Parameters:
+        messages (list): Messages after the question of the current turn.
+
+    Returns:
+        list: List of exchanges, each a list of messages.
+    """
+    exchanges = []
+    for message in messages:
+        pending_query = exchanges and all(
+            isinstance(m, AIMessage) and not m.tool_calls for m in exchanges[-1]
+        )
+        if not exchanges or (isinstance(message, AIMessage) and not pending_query):
+            exchanges.append([message])
+        else:
+            exchanges[-1].append(message)
+    return exchanges
+
+
+def _is_schema_exchange(exchange: List[BaseMessage]) -> bool:
+    return any(isinstance(m, ToolMessage) and m.name in SCHEMA_TOOLS for m in exchange)
+
+
+def _summarize_exchange(exchange: List[BaseMessage]) -> Optional[str]:
+    queries = [
+        tc["args"].get("query")
+        for m in exchange
+        if isinstance(m, AIMessage)
+        for tc in m.tool_calls
+        if tc["name"] == "db_query_tool"
+    ]
+    results = [m.content for m in exchange if isinstance(m, ToolMessage)]
+    if not queries or not results:
+        return None
+    return f"- Tried `{_shorten(queries[-1])}` -> {_shorten(results[-1])}"
+
+
+def _summarize_turns(turns: List[List[BaseMessage]]) -> List[str]:
+    lines = []
+    for turn in turns:
+        question = turn[0].content if isinstance(turn[0], HumanMessage) else ""
+        answers = [
+            m.content
+            for m in turn
+            if isinstance(m, AIMessage) and not m.tool_calls and m.content
+        ]
+        answer = answers[-1] if answers else ""
+        lines.append(f"- Q: {_shorten(question)} A: {_shorten(answer)}")
+    return lines
+
+
+def _summary_message(attempt_lines: List[str], turn_lines: List[str]) -> SystemMessage:
+    lines = ["Summary of messages left out of the context:"]
+    if turn_lines:
+        lines += ["Earlier conversation:"] + turn_lines
+    if attempt_lines:
+        lines += ["Earlier attempts for the current question:"] + attempt_lines
+    return SystemMessage(content="\n".join(lines))
+
+
+def build_context(
+    messages: List[BaseMessage],
+    token_budget: Optional[int] = None,
+    keep_exchanges: Optional[int] = None,
+) -> List[BaseMessage]:
+    """
+    Selects the messages sent to the LLM so that prompt size stays bounded.
+
+    The current question, the latest schema lookup and the latest exchange are
+    always kept. Earlier exchanges of the current turn are kept newest first, up
+    to ``keep_exchanges`` and within ``token_budget``. Everything else (older
+    turns and dropped query attempts) is condensed into a short summary
+    SystemMessage placed before the question, as far as the budget allows.
+
+    Parameters:
+        messages (list): All messages of the graph state.
+        token_budget (int or None): Token budget of the messages. Defaults to CONTEXT_TOKEN_BUDGET.
+        keep_exchanges (int or None): Number of exchanges to keep. Defaults to CONTEXT_KEEP_EXCHANGES.
+
+    Returns:
+        list: The messages to send, in their original order.
+    """
+    if token_budget is None:
+        token_budget = int(os.getenv("CONTEXT_TOKEN_BUDGET", "4000"))
+    if keep_exchanges is None:
+        keep_exchanges = int(os.getenv("CONTEXT_KEEP_EXCHANGES", "3"))
+
+    starts = [i for i, m in enumerate(messages) if isinstance(m, HumanMessage)]
+    if not starts:
+        return list(messages)
+    question = messages[starts[-1]]
+    exchanges = split_exchanges(messages[starts[-1] + 1 :])
+    turns = [
+        messages[start:end] for start, end in zip(starts, starts[1:] + [len(messages)])
+    ][:-1]
+
+    kept = set()
+    if exchanges:
+        kept.add(len(exchanges) - 1)
+    schema = [
+        i for i, exchange in enumerate(exchanges) if _is_schema_exchange(exchange)
+    ]
+    if schema:
+        kept.add(schema[-1])
+    used = estimate_tokens(question) + sum(
+        estimate_tokens(m) for i in kept for m in exchanges[i]
+    )
+
+    kept_exchanges = len(kept.difference(schema[-1:]))
+    for i in reversed(range(len(exchanges))):
+        if i in kept or kept_exchanges >= keep_exchanges:
+            continue
+        size = sum(estimate_tokens(m) for m in exchanges[i])
+        if used + size > token_budget:
+            break
+        kept.add(i)
+        used += size
+        kept_exchanges += 1
+
+    context = [question] + [m for i in sorted(kept) for m in exchanges[i]]
+
+    attempt_lines = [
+        _summarize_exchange(exchange)
+        for i, exchange in enumerate(exchanges)
+        if i not in kept
+    ]
+    attempt_lines = [line for line in attempt_lines if line]
+    turn_lines = _summarize_turns(turns)
+    # Drop the oldest lines, earlier turns first, until the summary fits the budget.
+    while attempt_lines or turn_lines:
+        summary = _summary_message(attempt_lines, turn_lines)
+        if used + estimate_tokens(summary) <= token_budget:
+            context.insert(0, summary)
+            break
+        (turn_lines or attempt_lines).pop(0)
+    return context
@@ -1,20 +1,233 @@
+import asyncio
+import os
+import queue
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import lru_cache, partial
+from pathlib import Path
+from typing import Any, Callable, Iterator, Optional
+
 from langchain_community.utilities import SQLDatabase
 
-# db = get_db(uri=os.getenv("SQL_SAMPLE_DB_URI"))
-db = SQLDatabase.from_uri(
-    "sqlite:///E:\python projects\sql-agent-langgraph-streamlit\sql_db\sample_sqlite3.db"
-)
+DEFAULT_DB_URI = "sqlite:///E:\python projects\sql-agent-langgraph-streamlit\sql_db\sample_sqlite3.db"
+
+
+@lru_cache(maxsize=None)
+def get_db(uri: Optional[str] = None) -> SQLDatabase:
+    """
+    Returns the SQLDatabase for a URI, connecting on first use.
+
+    The instance is cached per process, so importing the app does not touch the
+    database and Streamlit reruns reuse the same engine.
+
+    Parameters:
+        uri (str or None): SQLAlchemy database URI. Defaults to SQL_SAMPLE_DB_URI,
+            or the SQLite file at SQL_DB_PATH_VAR.
+
+    Returns:
+        SQLDatabase: The database.
+    """
+    uri = uri or os.getenv("SQL_SAMPLE_DB_URI")
+    if not uri and os.getenv("SQL_DB_PATH_VAR"):
+        uri = f"sqlite:///{os.getenv('SQL_DB_PATH_VAR')}"
+    uri = uri or DEFAULT_DB_URI
+    print(f"Connecting to database: {uri}")
+    return SQLDatabase.from_uri(uri)
+
+
+def get_db_path() -> str:
+    """
+    Returns the file path of the app database.
+    """
+    return get_db()._engine.url.database
+
+
+def reset_db() -> None:
+    """
+    Closes the cached database connections, e.g. before the database file is deleted.
+    The next call to ``get_db`` or ``get_pool`` connects again.
+    """
+    if get_db.cache_info().currsize:
+        get_db()._engine.dispose()
+    get_db.cache_clear()
+    close_pools()
+
+
+def connect_read_only(db_path: Optional[str] = None) -> sqlite3.Connection:
+    """
+    Opens a read-only connection to a SQLite database.
+
+    Parameters:
+        db_path (str or None): Path to the SQLite database file. Defaults to the app database.
+
+    Returns:
+        sqlite3.Connection: The read-only connection.
+    """
+    db_path = db_path or get_db_path()
+    return sqlite3.connect(
+        f"{Path(db_path).resolve().as_uri()}?mode=ro",
+        uri=True,
+        check_same_thread=False,
+    )
+
+
+class SQLitePool:
+    """
+    Connections to one SQLite database file: a pool of read-only connections
+    for queries and a single writer connection for ingestion.
+
+    The database is switched to WAL mode by the writer, so readers see a
+    consistent snapshot and never block behind an upload. Readers are tuned for
+    analytical scans (``mmap_size``, ``cache_size``, ``temp_store``) and opened
+    with ``query_only``. At most SQLITE_POOL_SIZE readers are open; further
+    callers wait for a free one.
+    """
+
+    def __init__(self, db_path: str, size: Optional[int] = None):
+        self.db_path = db_path
+        self.size = size or int(os.getenv("SQLITE_POOL_SIZE", "8"))
+        self.mmap_size = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+        # Negative values are in KiB, as in PRAGMA cache_size.
+        self.cache_size = int(os.getenv("SQLITE_CACHE_SIZE", "-65536"))
+        self.closed = False
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(self.size)
+        self._write_lock = threading.Lock()
+        self._writer: Optional[sqlite3.Connection] = None
+
+    def _tune(self, conn: sqlite3.Connection) -> None:
+        conn.execute(f"PRAGMA mmap_size = {self.mmap_size}")
+        conn.execute(f"PRAGMA cache_size = {self.cache_size}")
+        conn.execute("PRAGMA temp_store = MEMORY")
+
+    def _connect_reader(self) -> sqlite3.Connection:
+        if self._writer is None and Path(self.db_path).exists():
+            # Readers cannot change the journal mode; WAL is persistent once set.
+            try:
+                with self.writer():
+                    pass
+            except sqlite3.Error as e:
+                print(f"Could not switch {self.db_path} to WAL mode: {e}")
+        conn = connect_read_only(self.db_path)
+        conn.execute("PRAGMA query_only = ON")
+        self._tune(conn)
+        return conn
+
+    @contextmanager
+    def reader(self) -> Iterator[sqlite3.Connection]:
+        """
+        Borrows a read-only connection from the pool.
+        """
+        self._slots.acquire()
+        conn = None
+        try:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                conn = self._connect_reader()
+            yield conn
+        finally:
+            if conn is not None:
+                conn.set_progress_handler(None, 0)
+                if self.closed:
+                    conn.close()
+                else:
+                    self._idle.put(conn)
+            self._slots.release()
+
+    @contextmanager
+    def writer(self) -> Iterator[sqlite3.Connection]:
+        """
+        Holds the writer connection. Writes are serialized by a lock, since
+        SQLite allows a single writer per database. The connection is in
+        autocommit mode; callers manage their transactions with BEGIN/COMMIT.
+        """
+        with self._write_lock:
+            if self._writer is None:
+                conn = sqlite3.connect(
+                    self.db_path, isolation_level=None, check_same_thread=False
+                )
+                conn.execute("PRAGMA journal_mode = WAL")
+                # Commits in WAL mode stay durable against application crashes.
+                conn.execute("PRAGMA synchronous = NORMAL")
+                self._tune(conn)
+                self._writer = conn
+            yield self._writer
+
+    def close(self) -> None:
+        """
+        Closes the idle readers and the writer. Borrowed readers are closed when returned.
+        """
+        self.closed = True
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+        with self._write_lock:
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(db_path: Optional[str] = None) -> SQLitePool:
+    """
+    Returns the connection pool of a SQLite database file, creating it on first use.
+
+    Parameters:
+        db_path (str or None): Path to the SQLite database file. Defaults to the app database.
+
+    Returns:
+        SQLitePool: The pool.
+    """
+    db_path = str(Path(db_path or get_db_path()).resolve())
+    with _pools_lock:
+        pool = _pools.get(db_path)
+        if pool is None:
+            pool = _pools[db_path] = SQLitePool(db_path)
+        return pool
+
+
+def close_pools() -> None:
+    """
+    Closes all connection pools.
+    """
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close()
+
+
+@lru_cache(maxsize=None)
+def get_db_executor() -> ThreadPoolExecutor:
+    """
+    Returns the thread pool that runs database work for the async graph.
+
+    The pool is bounded by DB_THREADS, so many concurrent sessions share a fixed
+    number of SQLite connections instead of blocking the event loop.
+    """
+    return ThreadPoolExecutor(
+        max_workers=int(os.getenv("DB_THREADS", "8")), thread_name_prefix="sql-db"
+    )
+
 
-# Check if the db object is valid and connected
-if db is not None and db._engine:
-    print("Database connection exists.")
-else:
-    print("Database connection does not exist.")
+async def run_in_db_thread(func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    """
+    Runs a blocking database call on the database thread pool.
 
-# Query to check if any tables exist
-query = "SELECT name FROM sqlite_master WHERE type='table';"
-tables = db.run(query)
+    Parameters:
+        func (callable): The blocking function.
+        args, kwargs: Arguments of the function.
 
-# If no tables exist, the database is empty
-if not tables:
-    print("Database is empty (no tables found).")
+    Returns:
+        The return value of the function.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_db_executor(), partial(func, *args, **kwargs))
@@ -0,0 +1,437 @@
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import uuid
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from src.column_stats import STATS_TABLE
+from src.db import get_db_path, get_pool
+from src.executor import QueryResult, cancelled_error, fetch_result, run_query_result
+from src.query_cache import data_version
+
+ENGINES = ("sqlite", "duckdb")
+# DuckDB types of the SQLite column types written by ingestion.
+DUCKDB_TYPES = {
+    "INTEGER": "BIGINT",
+    "REAL": "DOUBLE",
+    "TEXT": "VARCHAR",
+    "TIMESTAMP": "TIMESTAMP",
+}
+# Suffix of the directory holding the Parquet copies of a database's tables.
+PARQUET_DIR_SUFFIX = ".parquet"
+# Suffix of the file recording which engine a database was created with.
+ENGINE_FILE_SUFFIX = ".engine"
+# File in the Parquet directory recording the SQLite version each table was copied at.
+MANIFEST_FILE = "manifest.json"
+
+
+def _sql_string(path: Path, suffix: str = "") -> str:
+    text = path.resolve().as_posix() + suffix
+    return "'" + text.replace("'", "''") + "'"
+
+
+class TableWriter:
+    """
+    Receives the chunks of a table being ingested into SQLite, so an engine can
+    keep its own copy of the table. The SQLite engine queries the SQLite table
+    itself, so this base class does nothing.
+    """
+
+    def write(self, chunk) -> None:
+        pass
+
+    def retype(self, column_types: Dict[str, str]) -> None:
+        """
+        Casts the chunks written so far to widened column types (SQLite types).
+        """
+
+    def commit(self) -> None:
+        pass
+
+    def abort(self) -> None:
+        pass
+
+
+class SQLiteEngine:
+    """
+    Runs queries on the SQLite database through the pooled read-only connections.
+    """
+
+    name = "sqlite"
+    dialect = "SQLite"
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+
+    def prepare(self) -> None:
+        pass
+
+    def run_query(self, query: str, **limits) -> QueryResult:
+        return run_query_result(query, db_path=self.db_path, **limits)
+
+    def explain(self, query: str) -> Optional[str]:
+        """
+        Compiles a query without running it.
+
+        Returns:
+            str or None: The error message, or None if the query compiles.
+        """
+        try:
+            with get_pool(self.db_path).reader() as conn:
+                conn.execute(f"EXPLAIN {query.strip().rstrip(';')}").close()
+        except sqlite3.Error as e:
+            return f"Error: {e}"
+        return None
+
+    def table_writer(self, table_name: str) -> TableWriter:
+        return TableWriter()
+
+    def close(self) -> None:
+        pass
+
+
+class ParquetTableWriter(TableWriter):
+    """
+    Writes the chunks of a table as Parquet files into a staging directory that
+    replaces the table's directory on commit.
+    """
+
+    def __init__(self, engine: "DuckDBEngine", table_name: str):
+        self.engine = engine
+        self.table_name = table_name
+        self.staging_dir = engine.data_dir / f".staging-{table_name}-{uuid.uuid4().hex}"
+        self.staging_dir.mkdir(parents=True)
+        self.parts = 0
+
+    def write(self, chunk) -> None:
+        # Mixed-type object columns cannot be scanned by DuckDB; SQLite declares them TEXT.
+        chunk = chunk.astype(
+            {c: "string" for c, dtype in chunk.dtypes.items() if dtype == object}
+        )
+        path = self.staging_dir / f"part-{self.parts:05d}.parquet"
+        cursor = self.engine.connection.cursor()
+        try:
+            cursor.register("chunk", chunk)
+            cursor.execute(f"COPY chunk TO {_sql_string(path)} (FORMAT parquet)")
+        finally:
+            cursor.close()
+        self.parts += 1
+
+    def retype(self, column_types: Dict[str, str]) -> None:
+        casts = ", ".join(
+            f'CAST("{column}" AS {DUCKDB_TYPES[t]}) AS "{column}"'
+            for column, t in column_types.items()
+        )
+        cursor = self.engine.connection.cursor()
+        try:
+            for path in sorted(self.staging_dir.glob("*.parquet")):
+                retyped = path.with_suffix(".retyped")
+                cursor.execute(
+                    f"COPY (SELECT {casts} FROM read_parquet({_sql_string(path)})) "
+                    f"TO {_sql_string(retyped)} (FORMAT parquet)"
+                )
+                os.replace(retyped, path)
+        finally:
+            cursor.close()
+
+    def commit(self) -> None:
+        if not self.parts:
+            # Nothing was ingested, so there is no table to copy.
+            self.abort()
+            return
+        table_dir = self.engine.data_dir / self.table_name
+        if table_dir.exists():
+            shutil.rmtree(table_dir)
+        os.replace(self.staging_dir, table_dir)
+        self.engine.copied(self.table_name)
+
+    def abort(self) -> None:
+        shutil.rmtree(self.staging_dir, ignore_errors=True)
+
+
+class DuckDBEngine:
+    """
+    Runs analytic queries with DuckDB over Parquet copies of the SQLite tables.
+
+    SQLite stays the system of record: ingestion writes the SQLite table (which
+    the schema catalog, column statistics and sample rows are read from) and a
+    Parquet copy in ``<database>.parquet/<table>/``. A manifest in that
+    directory records the row count, last rowid and DDL of each table when it
+    was copied, and tables that are missing or whose SQLite version differs
+    (e.g. after an INSERT outside ingestion) are copied again before the next
+    query. Creating an index leaves the tables' versions as they are. Rows
+    updated in place keep the version, so they are not picked up. Every table
+    is exposed as a DuckDB view, and
+    file access is restricted to the Parquet directory, so generated queries
+    cannot read other files.
+    """
+
+    name = "duckdb"
+    dialect = "DuckDB"
+
+    def __init__(self, db_path: str):
+        try:
+            import duckdb
+        except ImportError as e:
+            raise ImportError(
+                "SQL_ENGINE=duckdb requires the duckdb package: pip install duckdb"
+            ) from e
+        self.duckdb = duckdb
+        self.db_path = db_path
+        self.data_dir = Path(f"{db_path}{PARQUET_DIR_SUFFIX}")
+        self.data_dir.mkdir(parents=True, exist_ok=True)
+        self.connection = duckdb.connect()
+        self.connection.execute(
+            f"SET allowed_directories = [{_sql_string(self.data_dir, '/')}]"
+        )
+        self.connection.execute("SET enable_external_access = false")
+        self._lock = threading.Lock()
+        self._version = None
+        try:
+            self._manifest = json.loads((self.data_dir / MANIFEST_FILE).read_text())
+        except (OSError, ValueError):
+            self._manifest = {}
+
+    def invalidate(self) -> None:
+        self._version = None
+
+    @staticmethod
+    def _table_version(conn, table_name: str) -> List:
+        """
+        Returns the row count, last rowid and DDL of a SQLite table.
+        """
+        count = conn.execute(f'SELECT count(*) FROM "{table_name}"').fetchone()[0]
+        try:
+            last_rowid = conn.execute(f'SELECT max(rowid) FROM "{table_name}"')
+            last_rowid = last_rowid.fetchone()[0]
+        except sqlite3.OperationalError:
+            # WITHOUT ROWID table.
+            last_rowid = None
+        (ddl,) = conn.execute(
+            "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?",
+            (table_name,),
+        ).fetchone()
+        return [count, last_rowid, ddl]
+
+    def _save_manifest(self) -> None:
+        path = self.data_dir / MANIFEST_FILE
+        staging = path.with_suffix(".tmp")
+        staging.write_text(json.dumps(self._manifest))
+        os.replace(staging, path)
+
+    def copied(self, table_name: str) -> None:
+        """
+        Records the SQLite version of a table whose Parquet copy was just replaced.
+        """
+        with get_pool(self.db_path).reader() as conn:
+            self._manifest[table_name] = self._table_version(conn, table_name)
+        self._save_manifest()
+        self.invalidate()
+
+    def prepare(self) -> None:
+        """
+        Copies tables that are missing from the Parquet directory or changed in
+        SQLite since they were copied, and (re)creates the views. Only runs
+        again after the SQLite database changed.
+        """
+        version = data_version(self.db_path)
+        if version == self._version:
+            return
+        with self._lock:
+            if version == self._version:
+                return
+            with get_pool(self.db_path).reader() as conn:
+                table_versions = {
+                    name: self._table_version(conn, name)
+                    for (name,) in conn.execute(
+                        "SELECT name FROM sqlite_master WHERE type = 'table' "
+                        "AND name NOT LIKE 'sqlite_%' AND name != ?",
+                        (STATS_TABLE,),
+                    ).fetchall()
+                }
+            tables = list(table_versions)
+            for table_name, table_version in table_versions.items():
+                if (
+                    self._manifest.get(table_name) != table_version
+                    or not (self.data_dir / table_name).exists()
+                ):
+                    self._copy_table(table_name)
+            dropped = set(self._manifest).difference(tables)
+            if dropped:
+                for table_name in dropped:
+                    del self._manifest[table_name]
+                    shutil.rmtree(self.data_dir / table_name, ignore_errors=True)
+                self._save_manifest()
+            views = {
+                name
+                for (name,) in self.connection.execute(
+                    "SELECT view_name FROM duckdb_views() WHERE NOT internal"
+                ).fetchall()
+            }
+            for view in views.difference(tables):
+                self.connection.execute(f'DROP VIEW "{view}"')
+            for table_name in tables:
+                # Files are listed rather than globbed, so paths need no escaping.
+                files = ", ".join(
+                    _sql_string(path)
+                    for path in sorted((self.data_dir / table_name).glob("*.parquet"))
+                )
+                self.connection.execute(
+                    f'CREATE OR REPLACE VIEW "{table_name}" AS SELECT * FROM '
+                    f"read_parquet([{files}], union_by_name = true)"
+                )
+            self._version = version
+
+    def _copy_table(self, table_name: str) -> None:
+        import pandas as pd
+
+        print(f"Copying table {table_name} to Parquet for DuckDB")
+        writer = ParquetTableWriter(self, table_name)
+        try:
+            with get_pool(self.db_path).reader() as conn:
+                for chunk in pd.read_sql_query(
+                    f'SELECT * FROM "{table_name}"',
+                    conn,
+                    chunksize=int(os.getenv("INGEST_CHUNK_SIZE", "50000")),
+                ):
+                    writer.write(chunk)
+            if not writer.parts:
+                # DuckDB needs at least one file to know the columns of an empty table.
+                with get_pool(self.db_path).reader() as conn:
+                    writer.write(
+                        pd.read_sql_query(f'SELECT * FROM "{table_name}"', conn)
+                    )
+            writer.commit()
+        except Exception:
+            writer.abort()
+            raise
+
+    def run_query(
+        self,
+        query: str,
+        max_rows: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        timeout_seconds: Optional[float] = None,
+    ) -> QueryResult:
+        """
+        Runs a query like ``run_query_result``. The query is interrupted once it
+        runs past ``timeout_seconds`` (QUERY_TIMEOUT_SECONDS).
+        """
+        if max_rows is None:
+            max_rows = int(os.getenv("QUERY_MAX_ROWS", "200"))
+        if max_bytes is None:
+            max_bytes = int(os.getenv("QUERY_MAX_BYTES", "32768"))
+        if timeout_seconds is None:
+            timeout_seconds = float(os.getenv("QUERY_TIMEOUT_SECONDS", "15"))
+
+        self.prepare()
+        cursor = self.connection.cursor()
+        timer = None
+        if timeout_seconds:
+            timer = threading.Timer(timeout_seconds, cursor.interrupt)
+            timer.start()
+        try:
+            cursor.execute(query)
+            return fetch_result(cursor, max_rows, max_bytes)
+        except self.duckdb.Error as e:
+            if timer is not None and not timer.is_alive():
+                error = cancelled_error(
+                    timeout_seconds, f"the {timeout_seconds:g}s time limit"
+                )
+            else:
+                error = f"Error: {e}"
+            return QueryResult(error, [], [], 0, False)
+        finally:
+            if timer is not None:
+                timer.cancel()
+            cursor.close()
+
+    def explain(self, query: str) -> Optional[str]:
+        self.prepare()
+        cursor = self.connection.cursor()
+        try:
+            cursor.execute(f"EXPLAIN {query.strip().rstrip(';')}")
+        except self.duckdb.Error as e:
+            return f"Error: {e}"
+        finally:
+            cursor.close()
+        return None
+
+    def table_writer(self, table_name: str) -> TableWriter:
+        return ParquetTableWriter(self, table_name)
+
+    def close(self) -> None:
+        self.connection.close()
+
+
+_engines = {}
+_engines_lock = threading.Lock()
+
+
+def engine_name(db_path: str) -> str:
+    """
+    Returns the engine of a database: the one recorded in ``<database>.engine``,
+    or SQL_ENGINE for a database without one, which is then recorded for it.
+
+    Parameters:
+        db_path (str): Path to the SQLite database file.
+
+    Returns:
+        str: One of ENGINES.
+    """
+    engine_file = Path(f"{db_path}{ENGINE_FILE_SUFFIX}")
+    try:
+        name = engine_file.read_text().strip().lower()
+        source = str(engine_file)
+    except OSError:
+        name = os.getenv("SQL_ENGINE", "sqlite").lower()
+        source = "SQL_ENGINE"
+        if name in ENGINES:
+            try:
+                engine_file.write_text(name)
+            except OSError as e:
+                print(f"Could not record the engine of {db_path}: {e}")
+    if name not in ENGINES:
+        raise ValueError(f"{source} must be one of {', '.join(ENGINES)}, not {name}")
+    return name
+
+
+def get_engine(db_path: Optional[str] = None):
+    """
+    Returns the query engine of a database, creating it on first use.
+
+    ``sqlite`` (the default) runs queries on the SQLite file. ``duckdb`` runs them
+    with DuckDB over Parquet copies of the tables, which is much faster for
+    scans and aggregations over large uploads; it needs the optional duckdb package.
+    A database keeps the engine it was created with (see ``engine_name``);
+    SQL_ENGINE selects the engine of new databases.
+
+    Parameters:
+        db_path (str or None): Path to the SQLite database file. Defaults to the app database.
+
+    Returns:
+        SQLiteEngine or DuckDBEngine: The engine.
+    """
+    db_path = str(Path(db_path or get_db_path()).resolve())
+    with _engines_lock:
+        engine = _engines.get(db_path)
+        if engine is None:
+            name = engine_name(db_path)
+            print(f"Using the {name} engine for {db_path}")
+            engine_class = DuckDBEngine if name == "duckdb" else SQLiteEngine
+            engine = _engines[db_path] = engine_class(db_path)
+        return engine
+
+
+def close_engines() -> None:
+    """
+    Closes all engines, e.g. before their database is deleted.
+    """
+    with _engines_lock:
+        engines = list(_engines.values())
+        _engines.clear()
+    for engine in engines:
+        engine.close()
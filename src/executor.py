@@ -0,0 +1,177 @@
+import os
+import sqlite3
+import time
+from typing import Any, List, NamedTuple, Optional
+
+from src.db import get_pool
+
+# Same per-value limit SQLDatabase.run applies to long strings.
+MAX_STRING_LENGTH = 300
+FETCH_BATCH_SIZE = 500
+# Number of SQLite VM instructions between two checks of the query budget.
+PROGRESS_HANDLER_INTERVAL = 10000
+
+
+class QueryBudget:
+    """
+    SQLite progress handler that cancels a query once it runs past a wall-clock
+    deadline or a number of virtual machine steps.
+    """
+
+    def __init__(self, timeout_seconds: float, max_vm_steps: int):
+        self.timeout_seconds = timeout_seconds
+        self.max_vm_steps = max_vm_steps
+        self.started_at = time.monotonic()
+        self.vm_steps = 0
+        self.exceeded = None
+
+    def __call__(self) -> int:
+        self.vm_steps += PROGRESS_HANDLER_INTERVAL
+        if self.timeout_seconds and self.elapsed() > self.timeout_seconds:
+            self.exceeded = f"the {self.timeout_seconds:g}s time limit"
+        elif self.max_vm_steps and self.vm_steps > self.max_vm_steps:
+            self.exceeded = f"the {self.max_vm_steps} VM step limit"
+        # A non-zero return value makes SQLite interrupt the running statement.
+        return 1 if self.exceeded else 0
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started_at
+
+
+class QueryResult(NamedTuple):
+    # Rows formatted like SQLDatabase.run, "" if there are none, or an error message.
+    text: str
+    columns: List[str]
+    # The rendered rows, i.e. at most max_rows rows / max_bytes characters.
+    rows: List[tuple]
+    row_count: int
+    truncated: bool
+
+
+def _truncate_value(value: Any) -> Any:
+    if isinstance(value, str) and len(value) > MAX_STRING_LENGTH:
+        return value[: MAX_STRING_LENGTH - 3].rsplit(" ", 1)[0] + "..."
+    return value
+
+
+def run_query(*args, **kwargs) -> str:
+    """
+    Runs a query and returns its rows formatted as text. Takes the same
+    arguments as ``run_query_result``.
+    """
+    return run_query_result(*args, **kwargs).text
+
+
+def run_query_result(
+    query: str,
+    max_rows: Optional[int] = None,
+    max_bytes: Optional[int] = None,
+    db_path: Optional[str] = None,
+    timeout_seconds: Optional[float] = None,
+    max_vm_steps: Optional[int] = None,
+) -> QueryResult:
+    """
+    Runs a query and renders at most ``max_rows`` rows / ``max_bytes`` characters of the result.
+
+    Rows are streamed from the cursor in batches, so memory stays flat no matter
+    how many rows the query returns. Fetching stops at the first row past the
+    caps, so the cost does not grow with the size of the full result, and a
+    truncation notice is appended to the result.
+
+    The query is cancelled through SQLite's progress handler once it runs past
+    ``timeout_seconds`` or ``max_vm_steps``, so a runaway query (e.g. an
+    accidental cross join) cannot pin the worker.
+
+    Parameters:
+        query (str): The SQL query.
+        max_rows (int or None): Maximum number of rows to render. Defaults to QUERY_MAX_ROWS.
+        max_bytes (int or None): Maximum size of the rendered rows. Defaults to QUERY_MAX_BYTES.
+        db_path (str or None): Path to the SQLite database file. Defaults to the app database.
+        timeout_seconds (float or None): Wall-clock budget. Defaults to QUERY_TIMEOUT_SECONDS, 0 disables it.
+        max_vm_steps (int or None): VM step budget. Defaults to QUERY_MAX_VM_STEPS, 0 disables it.
+
+    Returns:
+        QueryResult: The rows formatted like ``SQLDatabase.run`` (an empty string
+            if there are none) or an error message starting with "Error:", plus the
+            column names and the rendered rows.
+    """
+    if max_rows is None:
+        max_rows = int(os.getenv("QUERY_MAX_ROWS", "200"))
+    if max_bytes is None:
+        max_bytes = int(os.getenv("QUERY_MAX_BYTES", "32768"))
+    if timeout_seconds is None:
+        timeout_seconds = float(os.getenv("QUERY_TIMEOUT_SECONDS", "15"))
+    if max_vm_steps is None:
+        max_vm_steps = int(os.getenv("QUERY_MAX_VM_STEPS", "0"))
+
+    budget = QueryBudget(timeout_seconds, max_vm_steps)
+    try:
+        with get_pool(db_path).reader() as conn:
+            conn.set_progress_handler(budget, PROGRESS_HANDLER_INTERVAL)
+            cursor = conn.execute(query)
+            try:
+                return fetch_result(cursor, max_rows, max_bytes)
+            finally:
+                # Resets the statement, so the pooled connection holds no read snapshot.
+                cursor.close()
+    except sqlite3.Error as e:
+        if budget.exceeded:
+            error = cancelled_error(budget.elapsed(), budget.exceeded)
+        else:
+            error = f"Error: {e}"
+        return QueryResult(error, [], [], 0, False)
+
+
+def cancelled_error(seconds: float, limit: str) -> str:
+    return (
+        f"Error: Query cancelled after {seconds:.1f}s because it exceeded "
+        f"{limit}. Rewrite the query to scan less data, for example "
+        "by adding filters or avoiding cross joins."
+    )
+
+
+def fetch_result(cursor, max_rows: int, max_bytes: int) -> QueryResult:
+    """
+    Streams the rows of an executed DB-API cursor and renders at most
+    ``max_rows`` rows / ``max_bytes`` characters of them. Fetching stops at the
+    first row that does not fit, so for a truncated result ``row_count`` is
+    the number of rows read, a lower bound of the full row count.
+
+    Parameters:
+        cursor: The cursor of the executed query.
+        max_rows (int): Maximum number of rows to render.
+        max_bytes (int): Maximum size of the rendered rows.
+
+    Returns:
+        QueryResult: The rendered rows, or an empty text if there are none.
+    """
+    rendered_rows = []
+    rows = []
+    size = 0
+    row_count = 0
+    truncated = False
+    columns = [column[0] for column in cursor.description or []]
+    # Never fetches more than one row past the row cap.
+    batch_size = min(FETCH_BATCH_SIZE, max_rows + 1)
+    while not truncated and (batch := cursor.fetchmany(batch_size)):
+        for row in batch:
+            row_count += 1
+            row = tuple(_truncate_value(value) for value in row)
+            text = repr(row)
+            if row_count > max_rows or size + len(text) + 2 > max_bytes:
+                truncated = True
+                break
+            rendered_rows.append(text)
+            rows.append(row)
+            size += len(text) + 2
+
+    if not row_count:
+        return QueryResult("", columns, [], 0, False)
+    result = f"[{', '.join(rendered_rows)}]"
+    if truncated:
+        result += (
+            f"\n[Result truncated: showing the first {len(rendered_rows)} rows; "
+            "the query returned more. Use filters, aggregates or a LIMIT to "
+            "narrow the result.]"
+        )
+    return QueryResult(result, columns, rows, row_count, truncated)
@@ -0,0 +1,81 @@
+import os
+import re
+from typing import Any, Optional
+
+# Aggregate column names such as COUNT(*) or avg("amount").
+AGGREGATE_COLUMN = re.compile(r"^\s*(\w+)\s*\(\s*(.*?)\s*\)\s*$")
+MAX_TEMPLATE_COLUMNS = 8
+
+
+def _label(column: str) -> str:
+    match = AGGREGATE_COLUMN.match(column)
+    if match:
+        function, argument = match.group(1), match.group(2).strip("\"'`[]")
+        if argument in ("", "*", "1"):
+            return function.capitalize()
+        return f"{function.capitalize()} of {argument.replace('_', ' ')}"
+    text = column.replace("_", " ").strip()
+    return text[:1].upper() + text[1:]
+
+
+def _value(value: Any) -> str:
+    if value is None:
+        return "NULL"
+    if isinstance(value, float):
+        # Full precision at every magnitude: the shortest text that reads back
+        # as the same float, so neither 0.004 nor 123456.78 gets rounded.
+        text = repr(value)
+        return text[:-2] if text.endswith(".0") else text
+    return str(value).replace("\n", " ")
+
+
+def format_result(
+    artifact: Optional[dict], max_rows: Optional[int] = None
+) -> Optional[str]:
+    """
+    Renders a small query result as a final answer without calling the LLM.
+
+    A single value is rendered as "Label: **value**", a single row as a list of
+    column/value pairs and up to ``max_rows`` rows as a markdown table. Larger
+    or truncated results return None, so the LLM summarizes them instead.
+
+    Parameters:
+        artifact (dict or None): The artifact of db_query_tool (columns and rows).
+        max_rows (int or None): Largest result rendered as a table. Defaults to
+            ANSWER_TEMPLATE_MAX_ROWS, 0 disables the templates.
+
+    Returns:
+        str or None: The markdown answer, or None if the result needs the LLM.
+    """
+    if max_rows is None:
+        max_rows = int(os.getenv("ANSWER_TEMPLATE_MAX_ROWS", "20"))
+    if not artifact or not max_rows:
+        return None
+    columns, rows = artifact["columns"], artifact["rows"]
+    if (
+        artifact.get("truncated")
+        or not rows
+        or len(rows) > max_rows
+        or not columns
+        or len(columns) > MAX_TEMPLATE_COLUMNS
+    ):
+        return None
+
+    if len(rows) == 1 and len(columns) == 1:
+        return f"{_label(columns[0])}: **{_value(rows[0][0])}**"
+    if len(rows) == 1:
+        return "\n".join(
+            f"- {_label(column)}: **{_value(value)}**"
+            for column, value in zip(columns, rows[0])
+        )
+    lines = [
+        f"Found {len(rows)} rows:",
+        "",
+        "| " + " | ".join(_label(column) for column in columns) + " |",
+        "|" + "---|" * len(columns),
+    ]
+    lines += [
+        "| " + " | ".join(_value(value).replace("|", "\\|") for value in row) + " |"
+        for row in rows
+    ]
+    return "\n".join(lines)
@@ -0,0 +1,233 @@
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import Counter
+from typing import List, Optional, Set
+
+from src.catalog import catalog
+from src.db import get_pool
+
+SQL_KEYWORDS = {
+    "where",
+    "on",
+    "join",
+    "inner",
+    "left",
+    "right",
+    "full",
+    "outer",
+    "cross",
+    "natural",
+    "group",
+    "order",
+    "limit",
+    "union",
+    "having",
+    "using",
+}
+
+# Columns compared in a predicate, optionally qualified with a table name or alias.
+PREDICATE_COLUMN = re.compile(
+    r'(?:"?(\w+)"?\.)?"?(\w+)"?\s*(?:=|<|>|!=|<>|\bIN\b|\bLIKE\b|\bBETWEEN\b|\bIS\b)',
+    re.IGNORECASE,
+)
+TABLE_REFERENCE = re.compile(
+    r'\b(?:FROM|JOIN)\s+"?(\w+)"?(?:\s+(?:AS\s+)?"?(\w+)"?)?', re.IGNORECASE
+)
+
+
+class IndexAdvisor:
+    """
+    Recommends and creates indexes for uploaded tables from the executed query workload.
+
+    Every successful query is analysed with ``EXPLAIN QUERY PLAN``. Filter and
+    join columns of tables that SQLite scans in full (or builds a temporary
+    automatic index for) are counted, and once a column has been used in
+    ``min_queries`` queries on a table with at least ``min_rows`` rows an index
+    is created in a background thread. The latency of the triggering query is
+    measured before and after the index is built.
+    """
+
+    def __init__(self, min_rows: int, min_queries: int, enabled: bool = True):
+        self.min_rows = min_rows
+        self.min_queries = min_queries
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._counts: Counter = Counter()
+        self._in_progress: Set[tuple] = set()
+        self.recommendations: List[dict] = []
+
+    @staticmethod
+    def _table_columns(conn, table_name: str) -> Set[str]:
+        rows = conn.execute(f'PRAGMA table_info("{table_name}")').fetchall()
+        return {row[1].lower() for row in rows}
+
+    def candidate_columns(self, conn, query: str) -> Set[tuple]:
+        """
+        Finds the (table, column) pairs of a query that would benefit from an index.
+
+        Parameters:
+            conn (sqlite3.Connection): Connection to the database.
+            query (str): The SQL query.
+
+        Returns:
+            set: Set of (table name, column name) tuples.
+        """
+        aliases = {}
+        for table_name, alias in TABLE_REFERENCE.findall(query):
+            if table_name.lower() in SQL_KEYWORDS:
+                continue
+            aliases[table_name.lower()] = table_name
+            if alias and alias.lower() not in SQL_KEYWORDS:
+                aliases[alias.lower()] = table_name
+
+        scanned = set()
+        automatic = set()
+        for *_, detail in conn.execute(f"EXPLAIN QUERY PLAN {query}").fetchall():
+            match = re.match(r"(SCAN|SEARCH) (\w+)(.*)", detail)
+            if not match or match.group(2).lower() not in aliases:
+                continue
+            table_name = aliases[match.group(2).lower()]
+            if match.group(1) == "SCAN" and "INDEX" not in match.group(3):
+                scanned.add(table_name)
+            elif "AUTOMATIC" in match.group(3):
+                for column in re.findall(r"(\w+)=\?", match.group(3)):
+                    automatic.add((table_name, column.lower()))
+
+        candidates = set(automatic)
+        for qualifier, column in PREDICATE_COLUMN.findall(query):
+            column = column.lower()
+            if qualifier:
+                tables = [aliases.get(qualifier.lower())]
+            else:
+                tables = list(scanned)
+            for table_name in tables:
+                if table_name in scanned and column in self._table_columns(
+                    conn, table_name
+                ):
+                    candidates.add((table_name, column))
+        return candidates
+
+    def observe(self, query: str) -> None:
+        """
+        Records an executed query and creates indexes once a column crosses the thresholds.
+
+        Parameters:
+            query (str): A query that ran successfully.
+
+        Returns:
+            None
+        """
+        if not self.enabled:
+            return
+        try:
+            with get_pool().reader() as conn:
+                candidates = self.candidate_columns(conn, query)
+                to_create = []
+                with self._lock:
+                    for candidate in candidates:
+                        self._counts[candidate] += 1
+                        if (
+                            self._counts[candidate] >= self.min_queries
+                            and candidate not in self._in_progress
+                            and self._row_estimate(conn, candidate[0]) >= self.min_rows
+                        ):
+                            self._in_progress.add(candidate)
+                            to_create.append(candidate)
+        except sqlite3.Error as e:
+            print(f"Index advisor could not analyse the query: {e}")
+            return
+
+        for table_name, column in to_create:
+            threading.Thread(
+                target=self.create_index, args=(table_name, column, query), daemon=True
+            ).start()
+
+    @staticmethod
+    def _row_estimate(conn, table_name: str) -> int:
+        # MAX(rowid) is a cheap upper bound of the row count for append-only tables.
+        return conn.execute(f'SELECT MAX(rowid) FROM "{table_name}"').fetchone()[0] or 0
+
+    @staticmethod
+    def _time_query(query: str) -> float:
+        with get_pool().reader() as conn:
+            started_at = time.perf_counter()
+            for _ in conn.execute(query):
+                pass
+            return time.perf_counter() - started_at
+
+    def create_index(
+        self, table_name: str, column: str, query: Optional[str] = None
+    ) -> dict:
+        """
+        Creates an index and measures the latency of a query before and after.
+
+        Parameters:
+            table_name (str): Name of the table.
+            column (str): Name of the column to index.
+            query (str or None): Query to time before and after creating the index.
+
+        Returns:
+            dict: The index DDL and the measured latencies.
+        """
+        index_name = f"idx_auto_{table_name}_{column}"
+        ddl = (
+            f'CREATE INDEX IF NOT EXISTS "{index_name}" ON "{table_name}" ("{column}")'
+        )
+        recommendation = {"table": table_name, "column": column, "ddl": ddl}
+        try:
+            if query:
+                recommendation["before_seconds"] = self._time_query(query)
+            print(f"Index advisor: {ddl}")
+            with get_pool().writer() as conn:
+                # The schema version is read in the same write transaction, so
+                # the bump it records comes from this index alone.
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    version_before = conn.execute("PRAGMA schema_version").fetchone()[0]
+                    conn.execute(ddl)
+                    version_after = conn.execute("PRAGMA schema_version").fetchone()[0]
+                    conn.execute("COMMIT")
+                except sqlite3.Error:
+                    conn.execute("ROLLBACK")
+                    raise
+            # Keeps the schema catalog, retriever index and SQL memo from being
+            # rebuilt for a change that leaves the tables as they are.
+            catalog.index_created(version_before, version_after)
+            if query:
+                recommendation["after_seconds"] = self._time_query(query)
+                recommendation["speedup"] = recommendation["before_seconds"] / max(
+                    recommendation["after_seconds"], 1e-9
+                )
+        except sqlite3.Error as e:
+            print(f"Index advisor could not create {index_name}: {e}")
+            recommendation["error"] = str(e)
+        with self._lock:
+            self.recommendations.append(recommendation)
+        return recommendation
+
+    def pending(self) -> List[dict]:
+        """
+        Returns the planned indexes that have not crossed the thresholds yet.
+        """
+        with self._lock:
+            return [
+                {
+                    "table": table_name,
+                    "column": column,
+                    "queries": count,
+                    "ddl": f'CREATE INDEX "idx_auto_{table_name}_{column}" '
+                    f'ON "{table_name}" ("{column}")',
+                }
+                for (table_name, column), count in self._counts.most_common()
+                if (table_name, column) not in self._in_progress
+            ]
+
+
+index_advisor = IndexAdvisor(
+    min_rows=int(os.getenv("INDEX_ADVISOR_MIN_ROWS", "10000")),
+    min_queries=int(os.getenv("INDEX_ADVISOR_MIN_QUERIES", "3")),
+    enabled=os.getenv("INDEX_ADVISOR", "yes") == "yes",
+)
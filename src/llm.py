@@ -1,18 +1,53 @@
 import os
+from functools import lru_cache
+from typing import Optional
 
-from langchain_groq.chat_models import ChatGroq
-from langchain_ollama import ChatOllama
+from langchain_core.language_models.chat_models import BaseChatModel
 
 from dotenv import load_dotenv, find_dotenv
 
 load_dotenv(find_dotenv(), override=True)
 
+from src.llm_cache import SQLiteLLMCache
 
-if os.getenv("USE_GROQ") == "no":
-    llm = ChatOllama(model=os.getenv("OLLAMA_CHAT_MODEL"), temperature=0.0)
-else:
-    llm = ChatGroq(
+
+@lru_cache(maxsize=None)
+def get_llm_cache() -> Optional[SQLiteLLMCache]:
+    """
+    Returns the persistent LLM response cache, or None if LLM_CACHE_PATH is not set.
+    """
+    # All chains run at temperature 0, so responses can be reused for identical inputs.
+    if not os.getenv("LLM_CACHE_PATH"):
+        return None
+    return SQLiteLLMCache(
+        database_path=os.getenv("LLM_CACHE_PATH"),
+        ttl_seconds=float(os.getenv("LLM_CACHE_TTL_SECONDS", str(7 * 24 * 3600))),
+        max_bytes=int(os.getenv("LLM_CACHE_MAX_BYTES", str(64 * 1024 * 1024))),
+    )
+
+
+@lru_cache(maxsize=None)
+def get_llm() -> BaseChatModel:
+    """
+    Returns the chat model, created on first use.
+
+    Set USE_GROQ="no" to use Ollama instead of Groq. The provider packages are
+    only imported when the model is created.
+    """
+    if os.getenv("USE_GROQ") == "no":
+        from langchain_ollama import ChatOllama
+
+        return ChatOllama(
+            model=os.getenv("OLLAMA_CHAT_MODEL"),
+            temperature=0.0,
+            cache=get_llm_cache(),
+        )
+
+    from langchain_groq.chat_models import ChatGroq
+
+    return ChatGroq(
         model=os.getenv("CHAT_GROQ_MODEL"),
         stop_sequences="[end]",
         temperature=0.0,
+        cache=get_llm_cache(),
     )
@@ -0,0 +1,118 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from typing import Any, Optional
+
+from langchain_core.caches import RETURN_VAL_TYPE, BaseCache
+from langchain_core.load import dumps, loads
+
+# Message fields that differ between otherwise identical prompts (random ids,
+# provider timings and token counts) and must not be part of the cache key.
+VOLATILE_MESSAGE_FIELDS = ("id", "response_metadata", "usage_metadata")
+
+
+def _strip_volatile_fields(value: Any) -> Any:
+    if isinstance(value, list):
+        return [_strip_volatile_fields(item) for item in value]
+    if isinstance(value, dict):
+        value = {key: _strip_volatile_fields(item) for key, item in value.items()}
+        if value.get("type") == "constructor" and isinstance(value.get("kwargs"), dict):
+            for field in VOLATILE_MESSAGE_FIELDS:
+                value["kwargs"].pop(field, None)
+        return value
+    return value
+
+
+class SQLiteLLMCache(BaseCache):
+    """
+    Persistent LLM response cache stored in a SQLite file.
+
+    Entries are keyed on a hash of the model configuration (which includes the
+    model name and any bound tools) and the serialized prompt messages. Entries
+    older than ``ttl_seconds`` are ignored, and the least recently used entries
+    are evicted once the cache grows past ``max_bytes``.
+    """
+
+    def __init__(self, database_path: str, ttl_seconds: float, max_bytes: int):
+        self.database_path = database_path
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(database_path, check_same_thread=False)
+        self._conn.execute("""CREATE TABLE IF NOT EXISTS llm_cache (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )""")
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS llm_cache_accessed_at ON llm_cache (accessed_at)"
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def _key(prompt: str, llm_string: str) -> str:
+        try:
+            prompt = json.dumps(_strip_volatile_fields(json.loads(prompt)))
+        except ValueError:
+            pass
+        return hashlib.sha256(f"{llm_string}\n{prompt}".encode("utf-8")).hexdigest()
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        key = self._key(prompt, llm_string)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created_at FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if now - row[1] > self.ttl_seconds:
+                self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+            self._conn.execute(
+                "UPDATE llm_cache SET accessed_at = ? WHERE key = ?", (now, key)
+            )
+            self._conn.commit()
+        return loads(row[0])
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        key = self._key(prompt, llm_string)
+        value = dumps(return_val)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache VALUES (?, ?, ?, ?, ?)",
+                (key, value, len(value), now, now),
+            )
+            self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now: float) -> None:
+        self._conn.execute(
+            "DELETE FROM llm_cache WHERE created_at < ?", (now - self.ttl_seconds,)
+        )
+        total_size = self._conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM llm_cache"
+        ).fetchone()[0]
+        if total_size <= self.max_bytes:
+            return
+        # Walk entries from least to most recently used until enough space is freed.
+        to_delete = []
+        for key, size in self._conn.execute(
+            "SELECT key, size FROM llm_cache ORDER BY accessed_at"
+        ):
+            if total_size <= self.max_bytes:
+                break
+            to_delete.append((key,))
+            total_size -= size
+        self._conn.executemany("DELETE FROM llm_cache WHERE key = ?", to_delete)
+
+    def clear(self, **kwargs: Any) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM llm_cache")
+            self._conn.commit()
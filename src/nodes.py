@@ -1,34 +1,64 @@
+import os
+import uuid
 from typing import Annotated, Literal
 
-from langchain_core.messages import AIMessage, ToolMessage
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
 
 from pydantic import BaseModel, Field
 from typing_extensions import TypedDict
 
 from langgraph.graph import END, StateGraph, START
 from langgraph.graph.message import AnyMessage, add_messages
-from langchain_community.agent_toolkits import create_sql_agent
 
 from dotenv import load_dotenv, find_dotenv
 
 load_dotenv(find_dotenv(), override=True)
 
-from src.state import GraphState
+from src.state import GraphState, is_first_turn
 from src.chains import (
-    query_checker_chain,
-    query_generator_chain,
-    get_schema_chain,
-    sql_agent_exec,
-    table_chain,
-    final_answer_chain,
+    get_query_checker_chain,
+    get_query_generator_chain,
+    get_schema_tool_chain,
+    get_sql_agent_exec,
+    get_table_chain,
+    get_final_answer_chain,
+    get_query_candidates_chain,
 )
-from src.llm import llm
-from src.tools import db
+from src.tools import execute_candidates, aexecute_candidates
+from src.db import run_in_db_thread
+from src.catalog import catalog
+from src.retriever import retriever
+from src.sql_memo import sql_memo
+from src.sql_validator import extract_sql, validate_sql
+from src.context import build_context
+from src.formatters import format_result
+from src.budget import start_budget, count_tokens, budget_exhausted
+
+
+def last_successful_query(messages: list) -> tuple[str, ToolMessage] | None:
+    """
+    Finds the last db_query_tool call of the current turn that returned a result.
+
+    Returns:
+        tuple or None: The SQL query and the ToolMessage holding its result.
+    """
+    results = {}
+    for message in reversed(messages):
+        if isinstance(message, HumanMessage):
+            break
+        if isinstance(message, ToolMessage) and message.name == "db_query_tool":
+            if not message.content.startswith("Error:"):
+                results.setdefault(message.tool_call_id, message)
+        elif isinstance(message, AIMessage):
+            for tc in reversed(message.tool_calls):
+                if tc["name"] == "db_query_tool" and tc["id"] in results:
+                    return tc["args"]["query"], results[tc["id"]]
+    return None
 
 
 def sql_agent(state: GraphState):
     print("--- sql_agent ----")
-    response = sql_agent_exec.invoke({"input": state["messages"][-1].content})
+    response = get_sql_agent_exec().invoke({"input": state["messages"][-1].content})
     print(f"response: {response}")
     return {"messages": [AIMessage(content=response["output"])]}
 
@@ -37,7 +67,7 @@ def first_tool_call(state: GraphState) -> dict[str, list[AIMessage]]:
     print("---- first_tool_call ----")
 
     # print(f"{state['messages']}")
-    # table_names = table_chain.invoke(state["messages"])
+    # table_names = get_table_chain().invoke(state["messages"])
     # print(table_names)
     return {
         "messages": [
@@ -53,12 +83,76 @@ def first_tool_call(state: GraphState) -> dict[str, list[AIMessage]]:
             )
         ],
         "question": state["messages"][-1].content,
+        **start_budget(state),
+    }
+
+
+def use_cached_sql(state: GraphState) -> dict[str, list[AIMessage]]:
+    print("---- use_cached_sql ----")
+    question = state["messages"][-1].content
+    sql = sql_memo.get(question)
+    return {
+        "messages": [
+            AIMessage(
+                content="",
+                tool_calls=[
+                    {
+                        "name": "db_query_tool",
+                        "args": {"query": sql},
+                        "id": "tool_cached_sql",
+                    }
+                ],
+            )
+        ],
+        "question": question,
+        "cached_sql": sql,
+        **start_budget(state),
     }
 
 
 def get_schema(state: GraphState) -> dict[str, list[AIMessage]]:
     print("---- get_schema ----")
-    return {"messages": [get_schema_chain.invoke(state["messages"])]}
+    message = get_schema_tool_chain().invoke(build_context(state["messages"]))
+    return {"messages": [message], "tokens_used": count_tokens(state, message)}
+
+
+async def aget_schema(state: GraphState) -> dict[str, list[AIMessage]]:
+    print("---- get_schema ----")
+    message = await get_schema_tool_chain().ainvoke(build_context(state["messages"]))
+    return {"messages": [message], "tokens_used": count_tokens(state, message)}
+
+
+def _validate_query(state: GraphState) -> tuple[int, dict | None]:
+    """
+    Validates the generated query locally. Returns the attempt number and, if
+    the query is valid and not risky, the state update that executes it.
+    """
+    # Every query runs through here before db_query_tool, so this counts attempts.
+    attempts = (state.get("attempts") or 0) + 1
+    query = extract_sql(state["messages"][-1].content)
+    validation = validate_sql(query)
+    if validation.ok and not validation.risky:
+        # SQLite already compiled the query, so skip the LLM checker.
+        return attempts, {
+            "messages": [
+                AIMessage(
+                    content="",
+                    tool_calls=[
+                        {
+                            "name": "db_query_tool",
+                            "args": {"query": query},
+                            "id": f"tool_{uuid.uuid4().hex}",
+                        }
+                    ],
+                )
+            ],
+            "attempts": attempts,
+        }
+    if validation.risky:
+        print(f"Query needs review: {', '.join(validation.risky)}")
+    else:
+        print(f"Local validation failed: {validation.error}")
+    return attempts, None
 
 
 def correct_query(state: GraphState) -> dict[str, list[AIMessage]]:
@@ -66,16 +160,54 @@ def correct_query(state: GraphState) -> dict[str, list[AIMessage]]:
     Utilize this tool to verify the accuracy of your query before executing it.
     """
     print("---- correct_query ----")
+    attempts, update = _validate_query(state)
+    if update is not None:
+        return update
+    message = get_query_checker_chain().invoke({"messages": [state["messages"][-1]]})
     return {
-        "messages": [query_checker_chain.invoke({"messages": [state["messages"][-1]]})]
+        "messages": [message],
+        "attempts": attempts,
+        "tokens_used": count_tokens(state, message),
     }
 
 
-def generate_query(state: GraphState):
-    print("---- generate_query ----")
-    print(f"STATE: {state}")
-    message = query_generator_chain.invoke(state)
+async def acorrect_query(state: GraphState) -> dict[str, list[AIMessage]]:
+    print("---- correct_query ----")
+    attempts, update = await run_in_db_thread(_validate_query, state)
+    if update is not None:
+        return update
+    message = await get_query_checker_chain().ainvoke(
+        {"messages": [state["messages"][-1]]}
+    )
+    return {
+        "messages": [message],
+        "attempts": attempts,
+        "tokens_used": count_tokens(state, message),
+    }
 
+
+def _query_generator_inputs(state: GraphState) -> dict:
+    """
+    Builds the input of the query generator and candidates chains.
+    """
+    # The fast path enters here straight from START, skipping first_tool_call.
+    question = state.get("question") or state["messages"][-1].content
+    if state.get("cached_sql"):
+        # The memoized query failed, so forget it and generate a new one.
+        sql_memo.discard(question)
+    table_info = catalog.get_table_info(retriever.get_relevant_tables(question))
+    # Only a token-budgeted window of the history is sent, so prompt size stays
+    # flat through long sessions and retry loops.
+    return {
+        **state,
+        "question": question,
+        "messages": build_context(state["messages"]),
+        "table_info": table_info,
+        "num_candidates": int(os.getenv("SQL_CANDIDATES", "1")),
+    }
+
+
+def _generated_query(state: GraphState, question: str, message: AIMessage) -> dict:
     tool_messages = []
     if message.tool_calls:
         for tc in message.tool_calls:
@@ -89,20 +221,178 @@ def generate_query(state: GraphState):
                 )
     else:
         tool_messages = []
-    return {"messages": [message] + tool_messages}
-
 
-def give_final_answer(state: GraphState):
-    print("---- give_final_answer ----")
+    budget = start_budget(state)
     return {
-        "messages": [
-            final_answer_chain.invoke(
-                {
-                    "question": state["question"],
-                    "sql_result": state["messages"][-1].tool_calls[-1]["args"][
-                        "final_answer"
-                    ],
-                }
-            )
+        "messages": [message] + tool_messages,
+        "question": question,
+        "cached_sql": "",
+        **budget,
+        "tokens_used": count_tokens({**state, **budget}, message),
+    }
+
+
+def generate_query(state: GraphState):
+    print("---- generate_query ----")
+    inputs = _query_generator_inputs(state)
+    message = get_query_generator_chain().invoke(inputs)
+    return _generated_query(state, inputs["question"], message)
+
+
+async def agenerate_query(state: GraphState):
+    print("---- generate_query ----")
+    inputs = await run_in_db_thread(_query_generator_inputs, state)
+    message = await get_query_generator_chain().ainvoke(inputs)
+    return _generated_query(state, inputs["question"], message)
+
+
+def _candidate_queries(response: dict) -> list[str]:
+    queries = []
+    if response["parsed"] is not None:
+        for query in response["parsed"].queries:
+            query = extract_sql(query)
+            if query and query not in queries:
+                queries.append(query)
+    return queries
+
+
+def _speculative_result(
+    state: GraphState,
+    question: str,
+    response: dict,
+    queries: list[str],
+    winner: int | None,
+    results: list,
+) -> dict:
+    print(f"Ran {len(queries)} candidate queries, winner: {winner}")
+    # On success only the winning query is recorded, otherwise every failure.
+    indexes = [winner] if winner is not None else range(len(queries))
+    messages = []
+    for i in indexes:
+        tool_call_id = f"tool_{uuid.uuid4().hex}"
+        messages += [
+            AIMessage(
+                content="",
+                tool_calls=[
+                    {
+                        "name": "db_query_tool",
+                        "args": {"query": queries[i]},
+                        "id": tool_call_id,
+                    }
+                ],
+            ),
+            ToolMessage(
+                content=results[i][0] or "Error: Query timed out.",
+                artifact=results[i][1],
+                name="db_query_tool",
+                tool_call_id=tool_call_id,
+            ),
         ]
+    budget = start_budget(state)
+    return {
+        "messages": messages,
+        "question": question,
+        "cached_sql": "",
+        **budget,
+        # One speculative round counts as a single attempt.
+        "attempts": (budget.get("attempts", state.get("attempts")) or 0) + 1,
+        "tokens_used": count_tokens({**state, **budget}, response["raw"]),
     }
+
+
+def speculative_query(state: GraphState):
+    """
+    Asks for SQL_CANDIDATES alternative queries in one LLM call and runs them in parallel.
+
+    The first candidate that returns rows is recorded as a db_query_tool
+    exchange and answered directly. If every candidate fails, their errors are
+    recorded instead and generate_query takes over.
+    """
+    print("---- speculative_query ----")
+    inputs = _query_generator_inputs(state)
+    response = get_query_candidates_chain().invoke(inputs)
+    queries = _candidate_queries(response)
+    winner, results = execute_candidates(queries)
+    return _speculative_result(
+        state, inputs["question"], response, queries, winner, results
+    )
+
+
+async def aspeculative_query(state: GraphState):
+    print("---- speculative_query ----")
+    inputs = await run_in_db_thread(_query_generator_inputs, state)
+    response = await get_query_candidates_chain().ainvoke(inputs)
+    queries = _candidate_queries(response)
+    winner, results = await aexecute_candidates(queries)
+    return _speculative_result(
+        state, inputs["question"], response, queries, winner, results
+    )
+
+
+def _final_answer_inputs(state: GraphState) -> tuple[dict | None, dict]:
+    """
+    Picks the result to answer with. Returns the templated answer (if the
+    result is small enough to skip the LLM) and the final answer chain input.
+    """
+    last_message = state["messages"][-1]
+    successful_query = last_successful_query(state["messages"])
+    # The ToolMessage whose rows answer the question, if any.
+    result_message = None
+    if getattr(last_message, "tool_calls", None):
+        sql_result = last_message.tool_calls[-1]["args"]["final_answer"]
+        if successful_query:
+            result_message = successful_query[1]
+    elif (
+        isinstance(last_message, ToolMessage)
+        and last_message.name == "db_query_tool"
+        and not last_message.content.startswith("Error:")
+    ):
+        # Memoized SQL and winning speculative candidates go straight from
+        # execute_query to the final answer.
+        sql_result = last_message.content
+        result_message = last_message
+    else:
+        # The request ran out of budget; answer with the best partial result.
+        reason = budget_exhausted(state) or "the agent stopped early"
+        print(f"Budget exhausted: {reason}")
+        if successful_query:
+            sql_result = (
+                f"{successful_query[1].content}\n(Partial result: {reason} "
+                "before the query could be refined.)"
+            )
+        else:
+            sql_result = (
+                f"No query succeeded because {reason}. "
+                f"Last message: {last_message.content}"
+            )
+    if (
+        successful_query
+        and result_message is successful_query[1]
+        and is_first_turn(state["messages"])
+    ):
+        # Only the query the answer is built from is memoized, never the last
+        # success of a turn that ran out of budget while still refining it.
+        # Follow-up questions depend on earlier turns, so they are not memoized.
+        sql_memo.put(state["question"], successful_query[0])
+
+    # Scalar and small tabular results are rendered without an LLM round trip.
+    answer = format_result(getattr(result_message, "artifact", None))
+    if answer is not None:
+        answer = {"messages": [AIMessage(content=answer, id=f"run-{uuid.uuid4()}")]}
+    return answer, {"question": state["question"], "sql_result": sql_result}
+
+
+def give_final_answer(state: GraphState):
+    print("---- give_final_answer ----")
+    answer, inputs = _final_answer_inputs(state)
+    if answer is not None:
+        return answer
+    return {"messages": [get_final_answer_chain().invoke(inputs)]}
+
+
+async def agive_final_answer(state: GraphState):
+    print("---- give_final_answer ----")
+    answer, inputs = await run_in_db_thread(_final_answer_inputs, state)
+    if answer is not None:
+        return answer
+    return {"messages": [await get_final_answer_chain().ainvoke(inputs)]}
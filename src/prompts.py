@@ -1,18 +1,19 @@
 from langchain_core.prompts import ChatPromptTemplate
 from src.schema import SubmitFinalAnswer
-from src.db import db
+from src.catalog import catalog
+from src.engines import get_engine
 
-category_system_prompt = f"""Return the names of the SQL tables that are relevant to the user question.
+category_system_prompt = """Return the names of the SQL tables that are relevant to the user question.
 The tables are:
 
-{", ".join(db.get_usable_table_names())}
+{table_names}
 """
 category_prompt = ChatPromptTemplate(
     [("system", category_system_prompt), ("placeholder", "{messages}")]
-)
+).partial(table_names=lambda: ", ".join(catalog.get_usable_table_names()))
 
 query_checker_system_prompt = """You are a SQL expert with a strong attention to detail.
-Double check the SQLite query for common mistakes, including:
+Double check the {dialect} query for common mistakes, including:
 - Using NOT IN with NULL values
 - Using UNION when UNION ALL should have been used
 - Using BETWEEN for exclusive ranges
@@ -28,7 +29,7 @@ You will call the appropriate tool to execute the query after running this check
 
 query_checker_prompt = ChatPromptTemplate(
     [("system", query_checker_system_prompt), ("placeholder", "{messages}")]
-)
+).partial(dialect=lambda: get_engine().dialect)
 """Given an input question, create a syntactically correct {dialect} query to run to help find the answer. 
 Unless the user specifies in his question a specific number of examples they wish to obtain, always limit your query to at most {top_k} results. 
 However, if the user's question implies that all relevant entries should be retrieved (e.g., asking for "all customers", "all records", "every instance", etc.), do not apply any limit on the results. Focus on retrieving all relevant entries in such cases.
@@ -44,7 +45,7 @@ Only use the following tables:
 Question: {input}"""
 query_generator_system_prompt = """You are a SQL expert with a strong attention to detail.
 
-Given an input question, output syntactically correct SQLite queries to run, then look at the results of the queries and return the answer.
+Given an input question, output syntactically correct {dialect} queries to run, then look at the results of the queries and return the answer.
 
 DO NOT call any tool besides SubmitFinalAnswer to submit the final answer.
 
@@ -68,7 +69,25 @@ DO NOT make any DML statements (INSERT, UPDATE, DELETE, DROP etc.) to the databa
 
 query_generator_prompt = ChatPromptTemplate(
     [("system", query_generator_system_prompt), ("placeholder", "{messages}")]
-).partial(table_info=db.get_table_info())
+).partial(table_info=catalog.get_table_info, dialect=lambda: get_engine().dialect)
+
+query_candidates_system_prompt = """You are a SQL expert with a strong attention to detail.
+
+Given an input question, write {num_candidates} different syntactically correct {dialect} queries that answer it.
+The queries are run in parallel and the first one that returns rows is used, so vary the approach
+(for example joins versus subqueries, exact versus case-insensitive matches) instead of repeating the same query.
+
+Only use the following tables:
+{table_info}
+
+Unless the user specifies a specific number of examples they wish to obtain, always limit your query to at most 5 results.
+Never query for all the columns from a specific table, only ask for the relevant columns given the question.
+
+DO NOT make any DML statements (INSERT, UPDATE, DELETE, DROP etc.) to the database."""
+
+query_candidates_prompt = ChatPromptTemplate(
+    [("system", query_candidates_system_prompt), ("placeholder", "{messages}")]
+).partial(table_info=catalog.get_table_info, dialect=lambda: get_engine().dialect)
 
 final_answer_system_prompt = """You are an expert database assistant. 
 Given a user question and the SQL query result, respond naturally, mentioning the question in as few words as possible and giving the answer clearly and directly. 
@@ -0,0 +1,189 @@
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from src.db import get_db_path
+
+
+def normalize_sql(query: str) -> str:
+    """
+    Normalizes SQL text for use as a cache key.
+
+    Whitespace outside string literals and quoted identifiers is collapsed and a
+    trailing semicolon is dropped, so cosmetic differences between otherwise
+    identical queries do not cause cache misses.
+
+    Parameters:
+        query (str): The SQL query.
+
+    Returns:
+        str: The normalized query.
+    """
+    parts = re.split(r"""('(?:[^']|'')*'|"(?:[^"]|"")*")""", query)
+    normalized = "".join(
+        part if i % 2 else re.sub(r"\s+", " ", part) for i, part in enumerate(parts)
+    )
+    return normalized.strip().rstrip(";").strip()
+
+
+def data_version(db_path: Optional[str] = None) -> Tuple:
+    """
+    Returns a token that changes whenever the database file is written to.
+
+    ``PRAGMA data_version`` is only comparable on a single connection, so the
+    modification time and size of the database file and its WAL file are used.
+
+    Parameters:
+        db_path (str or None): Path to the SQLite database file. Defaults to the app database.
+
+    Returns:
+        tuple: Opaque version token.
+    """
+    db_path = db_path or get_db_path()
+    token = []
+    for path in (db_path, f"{db_path}-wal"):
+        try:
+            stat = os.stat(path)
+            token.append((stat.st_mtime_ns, stat.st_size))
+        except OSError:
+            token.append(None)
+    return tuple(token)
+
+
+class QueryResultCache:
+    """
+    LRU cache of query results bounded by the total size of the cached results.
+
+    Entries are keyed on the normalized SQL text and remember the data version
+    they were computed at; an entry read at a different data version is a miss.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _drop(self, key: str) -> None:
+        self._bytes -= self._entries.pop(key)[3]
+
+    def get(self, query: str) -> Optional[str]:
+        """
+        Looks up the cached result of a query.
+
+        Parameters:
+            query (str): The SQL query.
+
+        Returns:
+            str or None: The cached result, or None on a miss.
+        """
+        entry = self.lookup(query)
+        return entry[0] if entry else None
+
+    def lookup(self, query: str) -> Optional[Tuple[str, Optional[dict]]]:
+        """
+        Looks up the cached result of a query together with its artifact.
+
+        Parameters:
+            query (str): The SQL query.
+
+        Returns:
+            tuple or None: The cached result and artifact, or None on a miss.
+        """
+        key = normalize_sql(query)
+        version = data_version()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] != version:
+                self._drop(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1], entry[4]
+
+    def put(
+        self,
+        query: str,
+        result: str,
+        version: Optional[Tuple] = None,
+        artifact: Optional[dict] = None,
+    ) -> None:
+        """
+        Caches the result of a query, evicting least recently used entries if needed.
+
+        Parameters:
+            query (str): The SQL query.
+            result (str): The query result.
+            version (tuple or None): Data version read before running the query.
+                Defaults to the current data version.
+            artifact (dict or None): Structured rows of the result (see db_query_tool).
+
+        Returns:
+            None
+        """
+        key = normalize_sql(query)
+        # The artifact holds the same rows as the result text, so count them twice.
+        size = len(key.encode("utf-8")) + len(result.encode("utf-8")) * (
+            2 if artifact else 1
+        )
+        if size > self.max_bytes:
+            return
+        identifiers = set(re.findall(r"\w+", key.lower()))
+        version = version or data_version()
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (version, result, identifiers, size, artifact)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate(self, table_name: Optional[str] = None) -> None:
+        """
+        Drops cached results that read from a table.
+
+        Parameters:
+            table_name (str or None): Name of the changed table. Pass None to drop everything.
+
+        Returns:
+            None
+        """
+        with self._lock:
+            if table_name is None:
+                self._entries.clear()
+                self._bytes = 0
+                return
+            for key in [
+                key
+                for key, (_, _, identifiers, *_) in self._entries.items()
+                if table_name.lower() in identifiers
+            ]:
+                self._drop(key)
+
+    def stats(self) -> dict:
+        """
+        Returns the hit/miss counters and current size of the cache.
+        """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+
+query_cache = QueryResultCache(
+    max_bytes=int(os.getenv("QUERY_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+)
@@ -0,0 +1,162 @@
+import math
+import os
+import re
+import threading
+from collections import Counter
+from typing import Dict, List, Optional
+
+from src.catalog import catalog
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Splits text into lowercase alphanumeric tokens with a naive plural stemmer.
+
+    Parameters:
+        text (str): Text to tokenize (question, table or column name, value).
+
+    Returns:
+        list: List of tokens.
+    """
+    tokens = []
+    for token in re.split(r"[^a-z0-9]+", str(text).lower()):
+        if not token:
+            continue
+        if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+class SchemaRetriever:
+    """
+    In-process BM25 index over table names, column names and distinct values
+    of low-cardinality text columns.
+
+    Used to send only the DDL of the tables relevant to a question to the model.
+    The index is rebuilt when the schema key of the catalog (database and
+    schema version) changes.
+    """
+
+    def __init__(
+        self,
+        max_distinct_values: int = 50,
+        value_sample_rows: int = 10000,
+        k1: float = 1.5,
+        b: float = 0.75,
+    ):
+        self.max_distinct_values = max_distinct_values
+        self.value_sample_rows = value_sample_rows
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.Lock()
+        self._key: Optional[tuple] = None
+        self._documents: Dict[str, Counter] = {}
+        self._doc_freq: Counter = Counter()
+        self._avg_length = 0.0
+
+    def _table_tokens(self, conn, table_name: str) -> List[str]:
+        tokens = tokenize(table_name)
+        columns = conn.exec_driver_sql(f'PRAGMA table_info("{table_name}")').fetchall()
+        for _, column_name, column_type, *_ in columns:
+            tokens.extend(tokenize(column_name))
+            if (
+                column_type
+                and "CHAR" not in column_type.upper()
+                and "TEXT" not in column_type.upper()
+            ):
+                continue
+            # Only index the values of categorical columns, judged on a bounded sample.
+            values = conn.exec_driver_sql(
+                f'SELECT DISTINCT "{column_name}" FROM '
+                f'(SELECT "{column_name}" FROM "{table_name}" LIMIT {self.value_sample_rows}) '
+                f"LIMIT {self.max_distinct_values + 1}"
+            ).fetchall()
+            if len(values) <= self.max_distinct_values:
+                for (value,) in values:
+                    if isinstance(value, str):
+                        tokens.extend(tokenize(value))
+        return tokens
+
+    def _build(self, key: tuple) -> None:
+        print(f"Building schema retriever index (schema_version={key[1]})")
+        documents = {}
+        with key[0].connect() as conn:
+            for table_name in catalog.get_usable_table_names():
+                documents[table_name] = Counter(self._table_tokens(conn, table_name))
+
+        self._documents = documents
+        self._doc_freq = Counter(
+            token for document in documents.values() for token in document
+        )
+        lengths = [sum(document.values()) for document in documents.values()]
+        self._avg_length = sum(lengths) / len(lengths) if lengths else 0.0
+        self._key = key
+
+    def reset(self) -> None:
+        """
+        Drops the index, e.g. after the database was deleted.
+        """
+        with self._lock:
+            self._key = None
+            self._documents = {}
+            self._doc_freq = Counter()
+            self._avg_length = 0.0
+
+    def score(self, question: str) -> Dict[str, float]:
+        """
+        Scores every table against the question with BM25.
+
+        Parameters:
+            question (str): The user question.
+
+        Returns:
+            dict: Mapping of table name to score.
+        """
+        with self._lock:
+            key = catalog.schema_key()
+            if key != self._key:
+                self._build(key)
+
+            n_docs = len(self._documents)
+            scores = {}
+            query_tokens = set(tokenize(question))
+            for table_name, document in self._documents.items():
+                length = sum(document.values())
+                score = 0.0
+                for token in query_tokens:
+                    tf = document.get(token, 0)
+                    if not tf:
+                        continue
+                    df = self._doc_freq[token]
+                    idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+                    norm = self.k1 * (
+                        1 - self.b + self.b * length / (self._avg_length or 1)
+                    )
+                    score += idf * tf * (self.k1 + 1) / (tf + norm)
+                scores[table_name] = score
+            return scores
+
+    def get_relevant_tables(
+        self, question: str, top_k: Optional[int] = None
+    ) -> List[str]:
+        """
+        Returns the names of the tables most relevant to the question.
+
+        Parameters:
+            question (str): The user question.
+            top_k (int or None): Number of tables to return. Defaults to SCHEMA_TOP_K_TABLES.
+
+        Returns:
+            list: Table names, or all tables if nothing in the index matches the question.
+        """
+        if top_k is None:
+            top_k = int(os.getenv("SCHEMA_TOP_K_TABLES", "5"))
+        scores = self.score(question)
+        if len(scores) <= top_k or not any(scores.values()):
+            return list(scores)
+        ranked = sorted(scores, key=lambda table_name: scores[table_name], reverse=True)
+        return [table_name for table_name in ranked[:top_k] if scores[table_name] > 0]
+
+
+retriever = SchemaRetriever()
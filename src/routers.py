@@ -1,7 +1,74 @@
+import os
 from typing import Literal
+from langchain_core.messages import ToolMessage
 from langgraph.graph import END
 
-from src.state import GraphState
+from src.state import GraphState, is_first_turn
+from src.catalog import catalog
+from src.sql_memo import sql_memo
+from src.budget import budget_exhausted
+
+
+def route_start(
+    state: GraphState,
+) -> Literal[
+    "use_cached_sql", "first_tool_call", "speculative_query", "generate_query"
+]:
+    """
+    Picks the entry point of the graph.
+
+    Questions answered before reuse their memoized SQL, on the first turn of a
+    conversation only: later questions may refer to earlier turns ("and for
+    2023?"), so the same words can need different SQL. With SQL_AGENT_FAST_PATH
+    enabled, the list-tables and get-schema hops are skipped when the schema
+    catalog is warm, since the query generator prompt already embeds the cached schema.
+    """
+    if is_first_turn(state["messages"]) and sql_memo.get(state["messages"][-1].content):
+        return "use_cached_sql"
+    if os.getenv("SQL_AGENT_FAST_PATH") == "yes" and catalog.is_warm():
+        return route_query_entry(state)
+    return "first_tool_call"
+
+
+def route_query_entry(
+    state: GraphState,
+) -> Literal["speculative_query", "generate_query"]:
+    """
+    Sends the first query attempt of a request to speculative_query when
+    SQL_CANDIDATES asks for more than one candidate.
+    """
+    if int(os.getenv("SQL_CANDIDATES", "1")) > 1:
+        return "speculative_query"
+    return "generate_query"
+
+
+def after_speculative_query(
+    state: GraphState,
+) -> Literal["generate_query", "give_final_answer"]:
+    last_message = state["messages"][-1] if state["messages"] else None
+    # Without usable candidates the node adds no messages, so the last message
+    # is whatever came before it (e.g. the schema) and must not be answered with.
+    if (
+        isinstance(last_message, ToolMessage)
+        and last_message.name == "db_query_tool"
+        and not last_message.content.startswith("Error:")
+    ):
+        return "give_final_answer"
+    if budget_exhausted(state):
+        return "give_final_answer"
+    return "generate_query"
+
+
+def after_execute_query(
+    state: GraphState,
+) -> Literal["generate_query", "give_final_answer"]:
+    if state.get("cached_sql") and not state["messages"][-1].content.startswith(
+        "Error:"
+    ):
+        return "give_final_answer"
+    if budget_exhausted(state):
+        return "give_final_answer"
+    return "generate_query"
 
 
 def should_continue(
@@ -12,6 +79,9 @@ def should_continue(
 
     if getattr(last_message, "tool_calls", None):
         return "give_final_answer"
+    # Out of attempts, time or tokens: answer with the best result so far.
+    if budget_exhausted(state):
+        return "give_final_answer"
     if last_message.content.startswith("Error:"):
         return "generate_query"
     else:
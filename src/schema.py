@@ -10,6 +10,15 @@ class SubmitFinalAnswer(BaseModel):
     )
 
 
+class SQLCandidates(BaseModel):
+    """Alternative SQL queries that answer the user question."""
+
+    queries: List[str] = Field(
+        ...,
+        description="Different syntactically correct SQL queries that answer the question, best first.",
+    )
+
+
 class Tables(BaseModel):
     """A table in a database."""
 
@@ -0,0 +1,120 @@
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+from src.catalog import catalog
+
+# Words that do not change which SQL answers a question.
+FILLER_WORDS = {
+    "a",
+    "an",
+    "the",
+    "please",
+    "can",
+    "could",
+    "would",
+    "you",
+    "me",
+    "show",
+    "tell",
+    "give",
+    "list",
+    "find",
+    "get",
+    "what",
+    "which",
+    "is",
+    "are",
+    "of",
+}
+
+
+def normalize_question(question: str) -> str:
+    """
+    Normalizes a question so that trivially different phrasings share a memo entry.
+
+    Parameters:
+        question (str): The user question.
+
+    Returns:
+        str: Lowercased question without punctuation and filler words.
+    """
+    tokens = re.findall(r"[a-z0-9_]+", question.lower())
+    return " ".join(token for token in tokens if token not in FILLER_WORDS)
+
+
+class QuestionSQLMemo:
+    """
+    Maps normalized questions to the SQL that answered them in a successful run.
+
+    Entries remember the schema key (database and schema version, see
+    ``SchemaCatalog.schema_key``) they were recorded at and are dropped once
+    the schema changes or another database is loaded.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, question: str) -> Optional[str]:
+        """
+        Returns the SQL recorded for a question, if any.
+
+        Parameters:
+            question (str): The user question.
+
+        Returns:
+            str or None: The memoized SQL query.
+        """
+        key = normalize_question(question)
+        schema_key = catalog.schema_key()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] != schema_key:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, question: str, sql: str) -> None:
+        """
+        Records the SQL that answered a question.
+
+        Parameters:
+            question (str): The user question.
+            sql (str): The validated SQL query.
+
+        Returns:
+            None
+        """
+        key = normalize_question(question)
+        if not key:
+            return
+        schema_key = catalog.schema_key()
+        with self._lock:
+            self._entries[key] = (schema_key, sql)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def discard(self, question: str) -> None:
+        """
+        Forgets the SQL recorded for a question.
+        """
+        with self._lock:
+            self._entries.pop(normalize_question(question), None)
+
+    def clear(self) -> None:
+        """
+        Forgets all recorded SQL, e.g. after the database was deleted.
+        """
+        with self._lock:
+            self._entries.clear()
+
+
+sql_memo = QuestionSQLMemo(max_entries=int(os.getenv("SQL_MEMO_MAX_ENTRIES", "1000")))
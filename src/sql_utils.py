@@ -3,14 +3,25 @@ import sqlite3
 import os
 import streamlit as st
 import re
-
-from langchain_community.utilities import SQLDatabase
-from src.db import db
-
-
-def get_db(uri):
-    db = SQLDatabase.from_uri(uri)
-    return db
+import shutil
+import time
+import io
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from queue import Empty
+
+from src.db import get_pool, reset_db
+from src.query_cache import query_cache
+from src.column_stats import TableStats
+from src.engines import (
+    ENGINE_FILE_SUFFIX,
+    PARQUET_DIR_SUFFIX,
+    close_engines,
+    get_engine,
+)
+from src.catalog import catalog
+from src.retriever import retriever
+from src.sql_memo import sql_memo
 
 
 def standardize_column_names(columns):
@@ -32,6 +43,442 @@ def standardize_column_names(columns):
     return standardized
 
 
+def infer_sqlite_type(dtype):
+    """
+    Maps a pandas dtype to the SQLite column type used by ``df.to_sql``.
+
+    Parameters:
+        dtype: The pandas dtype of a column.
+
+    Returns:
+        str: The SQLite column type.
+    """
+    if pd.api.types.is_bool_dtype(dtype) or pd.api.types.is_integer_dtype(dtype):
+        return "INTEGER"
+    if pd.api.types.is_float_dtype(dtype):
+        return "REAL"
+    if pd.api.types.is_datetime64_any_dtype(dtype):
+        return "TIMESTAMP"
+    return "TEXT"
+
+
+def widen_sqlite_type(declared_type, chunk_type):
+    """
+    Returns the narrowest SQLite column type that holds the values of both types.
+
+    INTEGER widens to REAL, and any other mismatch widens to TEXT, so the type
+    of a column only depends on the values in it, not on how they were chunked.
+
+    Parameters:
+        declared_type (str): The current type of the column.
+        chunk_type (str): The type inferred for the column in a new chunk.
+
+    Returns:
+        str: The widened column type.
+    """
+    if declared_type == chunk_type:
+        return declared_type
+    if {declared_type, chunk_type} == {"INTEGER", "REAL"}:
+        return "REAL"
+    return "TEXT"
+
+
+def cast_chunk_to_types(chunk, column_types):
+    """
+    Casts the columns of a DataFrame chunk to the pandas dtypes of their SQLite types.
+
+    The column types must hold the chunk's values (see ``widen_sqlite_type``),
+    so the casts never lose information. Nulls are kept.
+
+    Parameters:
+        chunk (pd.DataFrame): The DataFrame chunk.
+        column_types (dict): SQLite type per column name.
+
+    Returns:
+        pd.DataFrame: The cast chunk.
+    """
+    casts = {}
+    for column, sqlite_type in column_types.items():
+        values = chunk[column]
+        if sqlite_type == "INTEGER" and values.dtype != "int64":
+            casts[column] = values.astype("int64")
+        elif sqlite_type == "REAL" and values.dtype != "float64":
+            casts[column] = values.astype("float64")
+        elif sqlite_type == "TEXT" and not pd.api.types.is_string_dtype(values.dtype):
+            casts[column] = values.astype(object).where(
+                values.isna(), values.astype(str)
+            )
+    if not casts:
+        return chunk
+    chunk = chunk.copy()
+    for column, values in casts.items():
+        chunk[column] = values
+    return chunk
+
+
+def rebuild_table_with_types(conn, table_name, column_types):
+    """
+    Recreates a table with new column types, casting the rows already in it.
+
+    Parameters:
+        conn (sqlite3.Connection): Connection inside the ingestion transaction.
+        table_name (str): Name of the table.
+        column_types (dict): New SQLite type per column name.
+
+    Returns:
+        None
+    """
+    staging_table = f"{table_name}__retyped"
+    columns = ", ".join(f'"{column}" {t}' for column, t in column_types.items())
+    casts = ", ".join(f'CAST("{column}" AS {t})' for column, t in column_types.items())
+    conn.execute(f'CREATE TABLE "{staging_table}" ({columns})')
+    conn.execute(f'INSERT INTO "{staging_table}" SELECT {casts} FROM "{table_name}"')
+    conn.execute(f'DROP TABLE "{table_name}"')
+    conn.execute(f'ALTER TABLE "{staging_table}" RENAME TO "{table_name}"')
+
+
+def iter_dataframe_chunks(df, chunksize):
+    """
+    Splits a DataFrame into row chunks without copying the whole frame.
+
+    Parameters:
+        df (pd.DataFrame): The DataFrame to split.
+        chunksize (int): Number of rows per chunk.
+
+    Returns:
+        generator: Generator of DataFrame chunks.
+    """
+    if df.empty:
+        # Still yield the (empty) frame so the table gets created.
+        yield df
+    for start in range(0, len(df), chunksize):
+        yield df.iloc[start : start + chunksize]
+
+
+def standardize_chunk_columns(chunks):
+    """
+    Standardizes the column names of each DataFrame chunk.
+
+    Parameters:
+        chunks (iterable): Iterable of DataFrame chunks.
+
+    Returns:
+        generator: Generator of chunks with standardized column names.
+    """
+    for chunk in chunks:
+        chunk.columns = standardize_column_names(chunk.columns)
+        yield chunk
+
+
+def write_chunks_to_sqlite(chunks, db_path, table_name, if_exists="fail"):
+    """
+    Writes DataFrame chunks to a SQLite table in a single bulk-load transaction.
+
+    Column names and types are inferred from the first chunk. When a later
+    chunk does not fit a column type, the column is widened (INTEGER to REAL,
+    anything else to TEXT, see ``widen_sqlite_type``) and the rows written so
+    far are cast to the new type. Every chunk is cast to the declared types
+    before it is written, so the table schema does not depend on which rows
+    happen to land in which chunk and no value contradicts its column type.
+    Only one chunk is held in memory at a time. Column statistics for the
+    schema prompt are collected in the same pass and stored in the
+    ``_column_stats`` table, and the chunks are also handed to the query engine
+    (see ``get_engine``), e.g. to keep the Parquet copy DuckDB queries.
+
+    Parameters:
+        chunks (iterable): Iterable of DataFrame chunks (e.g. a ``pd.read_csv`` reader).
+        db_path (str): Path to the SQLite database file.
+        table_name (str): Name of the table to create in the database.
+        if_exists (str): "fail" to raise if the table exists, "replace" to drop it first.
+
+    Returns:
+        dict: Table name, number of rows written, elapsed seconds and rows per second.
+    """
+    started_at = time.perf_counter()
+    rows = 0
+    column_types = None
+    pool = get_pool(db_path)
+    engine_writer = get_engine(db_path).table_writer(table_name)
+    # Uploads go through the single writer connection; readers keep querying
+    # their WAL snapshot meanwhile.
+    with pool.writer() as conn:
+        try:
+            # Bulk-load settings, restored when the load is done.
+            conn.execute("PRAGMA synchronous = OFF")
+            conn.execute("PRAGMA cache_size = -200000")
+            conn.execute("BEGIN")
+            if if_exists == "replace":
+                conn.execute(f'DROP TABLE IF EXISTS "{table_name}"')
+
+            for chunk in chunks:
+                if column_types is None:
+                    column_types = {
+                        column: infer_sqlite_type(dtype)
+                        for column, dtype in chunk.dtypes.items()
+                    }
+                    columns = ", ".join(
+                        f'"{column}" {t}' for column, t in column_types.items()
+                    )
+                    conn.execute(f'CREATE TABLE "{table_name}" ({columns})')
+                    stats = TableStats(table_name, column_types)
+                    insert = (
+                        f'INSERT INTO "{table_name}" VALUES '
+                        f"({', '.join('?' * len(column_types))})"
+                    )
+                else:
+                    widened = {
+                        column: widen_sqlite_type(
+                            t, infer_sqlite_type(chunk[column].dtype)
+                        )
+                        for column, t in column_types.items()
+                    }
+                    if widened != column_types:
+                        print(
+                            f"Widening columns of '{table_name}': "
+                            + ", ".join(
+                                f"{column} {column_types[column]} -> {t}"
+                                for column, t in widened.items()
+                                if t != column_types[column]
+                            )
+                        )
+                        column_types = widened
+                        rebuild_table_with_types(conn, table_name, column_types)
+                        engine_writer.retype(column_types)
+                        stats.retype(column_types)
+                chunk = cast_chunk_to_types(chunk, column_types)
+
+                # Column statistics are collected in the same pass as the inserts.
+                stats.update(chunk)
+                engine_writer.write(chunk)
+                records = chunk.astype(object).where(chunk.notna(), None)
+                conn.executemany(insert, records.itertuples(index=False, name=None))
+                rows += len(chunk)
+
+            if column_types is not None:
+                stats.save(conn)
+            conn.execute("COMMIT")
+        except Exception:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            engine_writer.abort()
+            raise
+        finally:
+            conn.execute("PRAGMA synchronous = NORMAL")
+            conn.execute(f"PRAGMA cache_size = {pool.cache_size}")
+
+    engine_writer.commit()
+    query_cache.invalidate(table_name)
+    seconds = time.perf_counter() - started_at
+    stats = {
+        "table_name": table_name,
+        "rows": rows,
+        "seconds": seconds,
+        "rows_per_second": rows / seconds if seconds else 0.0,
+    }
+    print(
+        f"Wrote {rows} rows to '{table_name}' in {seconds:.2f}s "
+        f"({stats['rows_per_second']:.0f} rows/s)"
+    )
+    return stats
+
+
+def stream_csv_to_sqlite(file, db_path, table_name, chunksize=None, if_exists="fail"):
+    """
+    Streams a CSV file into a SQLite table chunk by chunk.
+
+    Column and table names are standardized like ``add_table_to_sqlite_db_from_df``
+    does. Peak memory is bounded by the chunk size rather than the file size.
+
+    Parameters:
+        file (str or file-like): Path to the CSV file or an open file (e.g. a Streamlit upload).
+        db_path (str): Path to the SQLite database file.
+        table_name (str): Name of the table to create in the database.
+        chunksize (int or None): Rows per chunk. Defaults to INGEST_CHUNK_SIZE.
+        if_exists (str): "fail" to raise if the table exists, "replace" to drop it first.
+
+    Returns:
+        dict: Table name, number of rows written, elapsed seconds and rows per second.
+    """
+    if chunksize is None:
+        chunksize = int(os.getenv("INGEST_CHUNK_SIZE", "50000"))
+    table_name = standardize_column_names([table_name])[0]
+    print(f"Streaming {getattr(file, 'name', file)} into table: {table_name}")
+    with pd.read_csv(file, chunksize=chunksize) as reader:
+        return write_chunks_to_sqlite(
+            standardize_chunk_columns(reader), db_path, table_name, if_exists
+        )
+
+
+# Bounded queues the parser processes of ``ingest_csv_files`` stream the
+# chunks of each file through, set in every worker by ``init_csv_parser``.
+_chunk_queues = None
+
+
+def init_csv_parser(chunk_queues):
+    """
+    Initializes a worker process of ``ingest_csv_files`` with the per-file chunk queues.
+    """
+    global _chunk_queues
+    _chunk_queues = chunk_queues
+
+
+def parse_csv_file(index, payload, chunksize):
+    """
+    Parses and type-infers a CSV file. Runs in a worker process of ``ingest_csv_files``.
+
+    Chunks are put on the file's queue as they are parsed, followed by None.
+    The queue is bounded, so a parser that runs ahead of the writer waits
+    instead of holding the whole file in memory.
+
+    Parameters:
+        index (int): Position of the file in ``ingest_csv_files``, i.e. of its queue.
+        payload (bytes): Contents of the CSV file.
+        chunksize (int): Rows per chunk.
+
+    Returns:
+        float: Parse seconds, not counting the time spent waiting for the writer.
+    """
+    started_at = time.perf_counter()
+    waited = 0.0
+    chunk_queue = _chunk_queues[index]
+    try:
+        with pd.read_csv(io.BytesIO(payload), chunksize=chunksize) as reader:
+            for chunk in standardize_chunk_columns(reader):
+                put_at = time.perf_counter()
+                chunk_queue.put(chunk)
+                waited += time.perf_counter() - put_at
+    finally:
+        # Ends the stream; a parse error reaches the writer through the future.
+        chunk_queue.put(None)
+    return time.perf_counter() - started_at - waited
+
+
+def received_chunks(chunk_queue, future):
+    """
+    Yields the chunks a ``parse_csv_file`` worker streams through its queue.
+
+    Raises the parse error once the stream ends, or as soon as the worker
+    failed without ending it (e.g. because the process died).
+    """
+    while True:
+        try:
+            chunk = chunk_queue.get(timeout=1)
+        except Empty:
+            if future.done() and future.exception() is not None:
+                future.result()
+            continue
+        if chunk is None:
+            future.result()
+            return
+        yield chunk
+
+
+def drain_chunks(chunk_queue, future):
+    """
+    Discards the rest of a file's chunks, so its parser is not left waiting
+    on a full queue after the file failed to be written.
+    """
+    while True:
+        try:
+            if chunk_queue.get(timeout=1) is None:
+                return
+        except Empty:
+            if future.done():
+                return
+
+
+def ingest_csv_files(
+    files, db_path, max_workers=None, chunksize=None, on_progress=None
+):
+    """
+    Ingests several CSV files, parsing them in parallel and writing them one at a time.
+
+    Parsing and dtype inference are CPU bound and run in a process pool, while
+    all writes go through this process because SQLite allows a single writer.
+    Tables are written in upload order, each one while its file is still being
+    parsed: workers stream chunks through a small bounded queue per file, so
+    memory stays at a few chunks per worker rather than whole files.
+
+    Parameters:
+        files (list): List of (file name, CSV bytes) tuples.
+        db_path (str): Path to the SQLite database file.
+        max_workers (int or None): Number of parser processes. Defaults to INGEST_WORKERS or the CPU count.
+        chunksize (int or None): Rows per chunk. Defaults to INGEST_CHUNK_SIZE.
+        on_progress (callable or None): Called with a per-file result dict as each file is done.
+
+    Returns:
+        dict: Per-file results, total rows and wall-clock seconds.
+    """
+    if max_workers is None:
+        max_workers = int(os.getenv("INGEST_WORKERS", "0")) or os.cpu_count()
+    if chunksize is None:
+        chunksize = int(os.getenv("INGEST_CHUNK_SIZE", "50000"))
+    queue_size = int(os.getenv("INGEST_QUEUE_CHUNKS", "2"))
+
+    started_at = time.perf_counter()
+    results = []
+    # Workers are spawned rather than forked: forking the multi-threaded app
+    # (Streamlit, the DB thread pool, the index advisor) can deadlock a child.
+    mp_context = multiprocessing.get_context("spawn")
+    chunk_queues = [mp_context.Queue(maxsize=queue_size) for _ in files]
+    with ProcessPoolExecutor(
+        max_workers=min(max_workers, len(files) or 1),
+        mp_context=mp_context,
+        initializer=init_csv_parser,
+        initargs=(chunk_queues,),
+    ) as pool:
+        # The pool starts files in submission order, so the file being written
+        # always has a running (or finished) parser.
+        futures = [
+            pool.submit(parse_csv_file, index, payload, chunksize)
+            for index, (_, payload) in enumerate(files)
+        ]
+        for index, (file_name, _) in enumerate(files):
+            future, chunk_queue = futures[index], chunk_queues[index]
+            futures[index] = None
+            result = {"file_name": file_name}
+            table_name = standardize_column_names([os.path.splitext(file_name)[0]])[0]
+            try:
+                written = write_chunks_to_sqlite(
+                    received_chunks(chunk_queue, future), db_path, table_name
+                )
+                result["parse_seconds"] = future.result()
+                result.update(written)
+            except Exception as e:
+                drain_chunks(chunk_queue, future)
+                print(f"Error ingesting {file_name}: {e}")
+                result["error"] = str(e)
+            results.append(result)
+            if on_progress:
+                on_progress(result)
+    for chunk_queue in chunk_queues:
+        chunk_queue.close()
+
+    seconds = time.perf_counter() - started_at
+    total_rows = sum(result.get("rows", 0) for result in results)
+    print(
+        f"Ingested {len(files)} files ({total_rows} rows) in {seconds:.2f}s "
+        f"with {max_workers} workers"
+    )
+    return {"files": results, "rows": total_rows, "seconds": seconds}
+
+
+def get_table_preview(db_path, table_name, limit=100):
+    """
+    Reads the first rows of a table.
+
+    Parameters:
+        db_path (str): Path to the SQLite database file.
+        table_name (str): Name of the table.
+        limit (int): Maximum number of rows to read.
+
+    Returns:
+        pd.DataFrame: The first rows of the table.
+    """
+    with get_pool(db_path).reader() as conn:
+        return pd.read_sql(f'SELECT * FROM "{table_name}" LIMIT {int(limit)}', conn)
+
+
 def add_table_to_sqlite_db(file_path, sheet_name, db_path, table_name):
     """
     Adds a new table to an existing SQLite database from an Excel or CSV file.
@@ -46,7 +493,9 @@ def add_table_to_sqlite_db(file_path, sheet_name, db_path, table_name):
         None
     """
     try:
-        # Step 1: Load data from the file
+        chunksize = int(os.getenv("INGEST_CHUNK_SIZE", "50000"))
+
+        # Step 1: Load data from the file (CSV files are read chunk by chunk)
         print(f"Loading data from file: {file_path}")
         if file_path.endswith(".xlsx") or file_path.endswith(".xls"):
             df = (
@@ -54,8 +503,9 @@ def add_table_to_sqlite_db(file_path, sheet_name, db_path, table_name):
                 if sheet_name
                 else pd.read_excel(file_path)
             )
+            chunks = iter_dataframe_chunks(df, chunksize)
         elif file_path.endswith(".csv"):
-            df = pd.read_csv(file_path)
+            chunks = pd.read_csv(file_path, chunksize=chunksize)
         else:
             raise ValueError(
                 "Unsupported file format. Please provide an Excel or CSV file."
@@ -63,21 +513,17 @@ def add_table_to_sqlite_db(file_path, sheet_name, db_path, table_name):
 
         # Step 2: Standardize column names
         print("Standardizing column names...")
-        df.columns = standardize_column_names(df.columns)
-        print(f"Standardized column names: {df.columns.tolist()}")
-
-        # Step 3: Connect to the SQLite database
-        print(f"Connecting to SQLite database: {db_path}")
-        conn = sqlite3.connect(db_path)
+        chunks = standardize_chunk_columns(chunks)
 
-        # Step 4: Write the DataFrame to a new table in the database
+        # Step 3: Write the chunks to a new table in a single transaction
         print(f"Adding new table: {table_name}")
-        df.to_sql(
-            table_name, conn, if_exists="fail", index=False
+        write_chunks_to_sqlite(
+            chunks, db_path, table_name, if_exists="fail"
         )  # Fail if the table already exists
         print(f"Table '{table_name}' successfully added to the database.")
 
         # Optional: Verify data insertion
+        conn = sqlite3.connect(db_path)
         query = f"SELECT * FROM {table_name} LIMIT 5;"
         print(f"Sample data from {table_name}:")
         print(pd.read_sql(query, conn))
@@ -90,7 +536,7 @@ def add_table_to_sqlite_db(file_path, sheet_name, db_path, table_name):
     except Exception as e:
         print(f"An error occurred: {e}")
     finally:
-        # Step 5: Close the database connection
+        # Step 4: Close the database connection
         if "conn" in locals():
             conn.close()
             print("Database connection closed.")
@@ -117,18 +563,18 @@ def add_table_to_sqlite_db_from_df(df, db_path, table_name):
         table_name = standardize_column_names([table_name])[0]
         print(f"Standardized column names: {df.columns.tolist()}")
 
-        # Step 2: Connect to the SQLite database
-        print(f"Connecting to SQLite database: {db_path}")
-        conn = sqlite3.connect(db_path)
-
-        # Step 3: Write the DataFrame to a new table in the database
+        # Step 2: Write the DataFrame to a new table in a single transaction
         print(f"Adding new table: {table_name}")
-        df.to_sql(
-            table_name, conn, if_exists="fail", index=False
+        write_chunks_to_sqlite(
+            iter_dataframe_chunks(df, int(os.getenv("INGEST_CHUNK_SIZE", "50000"))),
+            db_path,
+            table_name,
+            if_exists="fail",
         )  # Fail if the table already exists
         print(f"Table '{table_name}' successfully added to the database.")
 
         # Optional: Verify data insertion
+        conn = sqlite3.connect(db_path)
         query = f"SELECT * FROM {table_name} LIMIT 5;"
         print(f"Sample data from {table_name}:")
         print(pd.read_sql(query, conn))
@@ -141,7 +587,7 @@ def add_table_to_sqlite_db_from_df(df, db_path, table_name):
     except Exception as e:
         print(f"An error occurred: {e}")
     finally:
-        # Step 4: Close the database connection
+        # Step 3: Close the database connection
         if "conn" in locals():
             conn.close()
             print("Database connection closed.")
@@ -161,7 +607,9 @@ def excel_to_sqlite(excel_file, sheet_name, db_path, table_name):
         None
     """
     try:
-        # Step 1: Read the Excel sheet
+        chunksize = int(os.getenv("INGEST_CHUNK_SIZE", "50000"))
+
+        # Step 1: Read the Excel sheet (CSV files are read chunk by chunk)
         print(f"Reading Excel file: {excel_file}, Sheet: {sheet_name}")
         # df = pd.read_excel(excel_file, sheet_name=sheet_name)
 
@@ -174,23 +622,23 @@ def excel_to_sqlite(excel_file, sheet_name, db_path, table_name):
                 df = pd.read_excel(
                     excel_file
                 )  # Read the first sheet if no sheet name is provided
+            chunks = iter_dataframe_chunks(df, chunksize)
         elif excel_file.endswith(".csv"):
-            df = pd.read_csv(excel_file)  # Read CSV file (no sheet_name needed)
+            chunks = pd.read_csv(
+                excel_file, chunksize=chunksize
+            )  # Read CSV file (no sheet_name needed)
         else:
             raise ValueError(
                 "Unsupported file format. Please provide an Excel or CSV file."
             )
 
-        # Step 2: Connect to the SQLite database
-        print(f"Connecting to SQLite database: {db_path}")
-        conn = sqlite3.connect(db_path)
-
-        # Step 3: Write the DataFrame to a database table
+        # Step 2: Write the chunks to a database table in a single transaction
         print(f"Writing data to table: {table_name}")
-        df.to_sql(table_name, conn, if_exists="replace", index=False)
+        write_chunks_to_sqlite(chunks, db_path, table_name, if_exists="replace")
         print(f"Data successfully written to table: {table_name}")
 
         # Optional: Verify data insertion
+        conn = sqlite3.connect(db_path)
         query = f"SELECT * FROM {table_name} LIMIT 5;"
         print(f"Sample data from {table_name}:")
         print(pd.read_sql(query, conn))
@@ -199,7 +647,7 @@ def excel_to_sqlite(excel_file, sheet_name, db_path, table_name):
         print(f"An error occurred: {e}")
 
     finally:
-        # Step 4: Close the connection
+        # Step 3: Close the connection
         if "conn" in locals():
             conn.close()
             print("Database connection closed.")
@@ -219,21 +667,19 @@ def df_to_sqlite(df, db_name, table_name):
         None
     """
     try:
-        # Connect to SQLite database (creates the database if it doesn't exist)
-        conn = sqlite3.connect(db_name)
-
-        # Write the DataFrame to the SQLite table
-        df.to_sql(table_name, conn, if_exists="replace", index=False)
+        # Write the DataFrame to the SQLite table (creates the database if it doesn't exist)
+        write_chunks_to_sqlite(
+            iter_dataframe_chunks(df, int(os.getenv("INGEST_CHUNK_SIZE", "50000"))),
+            db_name,
+            table_name,
+            if_exists="replace",
+        )
 
         print(f"DataFrame successfully written to {table_name} table in {db_name}")
 
     except Exception as e:
         print(f"Error: {e}")
 
-    finally:
-        # Close the database connection
-        conn.close()
-
 
 def delete_db(db_name):
     """
@@ -249,8 +695,9 @@ def delete_db(db_name):
         # Check if the file exists
         if os.path.exists(db_name):
             print(f"connecting to db....")
-            # Ensure the connection is closed
-            db._engine.dispose()
+            # Ensure the connections, the connection pool and the engines are closed
+            reset_db()
+            close_engines()
 
             try:
                 conn = sqlite3.connect(db_name)
@@ -258,6 +705,20 @@ def delete_db(db_name):
             finally:
                 conn.close()
             os.remove(db_name)
+            for suffix in ("-wal", "-shm"):
+                if os.path.exists(db_name + suffix):
+                    os.remove(db_name + suffix)
+            if os.path.isdir(db_name + PARQUET_DIR_SUFFIX):
+                shutil.rmtree(db_name + PARQUET_DIR_SUFFIX)
+            # A new database at this path gets the engine SQL_ENGINE selects then.
+            if os.path.exists(db_name + ENGINE_FILE_SUFFIX):
+                os.remove(db_name + ENGINE_FILE_SUFFIX)
+            query_cache.invalidate()
+            # A new upload starts over at the same schema versions, so drop the
+            # caches derived from the old schema.
+            catalog.reset()
+            retriever.reset()
+            sql_memo.clear()
             print(f"Database '{db_name}' has been deleted successfully.")
         else:
             print(f"Database '{db_name}' does not exist.")
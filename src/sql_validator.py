@@ -0,0 +1,98 @@
+import re
+from typing import List, NamedTuple, Optional
+
+from src.engines import get_engine
+
+WRITE_KEYWORDS = re.compile(
+    r"\b(INSERT|UPDATE|DELETE|DROP|ALTER|CREATE|ATTACH|DETACH|PRAGMA|VACUUM|REINDEX)\b",
+    re.IGNORECASE,
+)
+
+# Patterns the LLM query checker is good at reviewing (see query_checker_system_prompt).
+RISKY_PATTERNS = {
+    "NOT IN with a subquery": re.compile(r"\bNOT\s+IN\s*\(\s*SELECT\b", re.IGNORECASE),
+    "BETWEEN": re.compile(r"\bBETWEEN\b", re.IGNORECASE),
+    "UNION without ALL": re.compile(r"\bUNION\b(?!\s+ALL\b)", re.IGNORECASE),
+}
+
+
+class ValidationResult(NamedTuple):
+    ok: bool
+    error: Optional[str]
+    risky: List[str]
+
+
+def extract_sql(text: str) -> str:
+    """
+    Extracts the SQL query from a model response, dropping markdown code fences.
+
+    Parameters:
+        text (str): The model response.
+
+    Returns:
+        str: The SQL query.
+    """
+    fenced = re.search(r"```(?:sql)?\s*(.*?)```", text, re.DOTALL | re.IGNORECASE)
+    if fenced:
+        text = fenced.group(1)
+    return text.strip()
+
+
+def _strip_literals(query: str) -> str:
+    return re.sub(
+        r"""'(?:[^']|'')*'|"(?:[^"]|"")*"|--[^\n]*|/\*.*?\*/""",
+        " ",
+        query,
+        flags=re.DOTALL,
+    )
+
+
+def read_only_error(query: str) -> Optional[str]:
+    """
+    Checks that a query is a single read-only statement.
+
+    Parameters:
+        query (str): The SQL query.
+
+    Returns:
+        str or None: An error message, or None if the query is read-only.
+    """
+    code = _strip_literals(query)
+    statements = [statement for statement in code.split(";") if statement.strip()]
+    if len(statements) > 1:
+        return "Error: Only a single SQL statement can be run at a time."
+    if not re.match(r"\s*(SELECT|WITH|VALUES)\b", code, re.IGNORECASE):
+        return "Error: Only SELECT queries can be run against the database."
+    keyword = WRITE_KEYWORDS.search(code)
+    if keyword:
+        return f"Error: {keyword.group(1).upper()} statements are not allowed, only SELECT queries."
+    return None
+
+
+def validate_sql(query: str, db_path: Optional[str] = None) -> ValidationResult:
+    """
+    Validates a query locally without calling the LLM.
+
+    The query must be a single read-only statement, and the database's engine
+    (see ``get_engine``) must be able to compile it (``EXPLAIN``), which catches
+    syntax errors as well as unknown tables and columns.
+
+    Parameters:
+        query (str): The SQL query.
+        db_path (str or None): Path to the SQLite database file. Defaults to the app database.
+
+    Returns:
+        ValidationResult: Whether the query is valid, the error if not, and the
+            names of risky patterns found in it.
+    """
+    error = read_only_error(query)
+    if error:
+        return ValidationResult(ok=False, error=error, risky=[])
+
+    error = get_engine(db_path).explain(query)
+    if error:
+        return ValidationResult(ok=False, error=error, risky=[])
+
+    code = _strip_literals(query)
+    risky = [name for name, pattern in RISKY_PATTERNS.items() if pattern.search(code)]
+    return ValidationResult(ok=True, error=None, risky=risky)
@@ -1,5 +1,48 @@
+from langchain_core.messages import HumanMessage
 from langgraph.graph import MessagesState
 
 
 class GraphState(MessagesState):
     question: str = ""
+    cached_sql: str = ""
+    # Per-request budget of the generate_query <-> execute_query loop (src/budget.py).
+    attempts: int = 0
+    deadline: float = 0.0
+    tokens_used: int = 0
+
+
+def turn_input(question: str) -> dict:
+    """
+    Graph input of a chat turn when the conversation is kept by a checkpointer.
+
+    Only the new message is sent; the earlier messages are restored from the
+    checkpoint. The per-turn fields are reset, so the question, memoized SQL
+    and budget of the previous turn do not carry over.
+
+    Parameters:
+        question (str): The user message.
+
+    Returns:
+        dict: The graph input.
+    """
+    return {
+        "messages": [HumanMessage(content=question)],
+        "question": "",
+        "cached_sql": "",
+        "attempts": 0,
+        "deadline": 0.0,
+        "tokens_used": 0,
+    }
+
+
+def is_first_turn(messages: list) -> bool:
+    """
+    Tells whether the last user message is the first of the conversation.
+
+    Parameters:
+        messages (list): The messages of the graph state.
+
+    Returns:
+        bool: True if no earlier turn exists.
+    """
+    return sum(isinstance(message, HumanMessage) for message in messages) <= 1
@@ -1,9 +1,10 @@
-from langchain_community.agent_toolkits import SQLDatabaseToolkit
-from langchain_core.tools import tool
+from langchain_core.tools import StructuredTool, tool
+import asyncio
 import os
 
 
-from typing import Any
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, List, Optional, Tuple
 from langchain_core.messages import ToolMessage
 from langchain_core.runnables import RunnableLambda, RunnableWithFallbacks
 from langgraph.prebuilt import ToolNode
@@ -13,29 +14,196 @@ from dotenv import load_dotenv, find_dotenv
 
 load_dotenv(find_dotenv(), override=True)
 
-from src.sql_utils import get_db
-from src.llm import llm
-from src.prompts import query_checker_prompt
-from src.db import db
+from src.catalog import catalog
+from src.query_cache import query_cache, data_version
+from src.sql_validator import read_only_error, validate_sql
+from src.engines import get_engine
+from src.index_advisor import index_advisor
+from src.db import run_in_db_thread
 
-toolkit = SQLDatabaseToolkit(db=db, llm=llm)
-tools = toolkit.get_tools()
 
-list_tables_tool = next(tool for tool in tools if tool.name == "sql_db_list_tables")
-get_schema_tool = next(tool for tool in tools if tool.name == "sql_db_schema")
+def list_tables(tool_input: str = "") -> str:
+    """Input is an empty string, output is a comma-separated list of tables in the database."""
+    return ", ".join(catalog.get_usable_table_names())
 
 
-@tool
-def db_query_tool(query: str) -> str:
+async def alist_tables(tool_input: str = "") -> str:
+    return await run_in_db_thread(list_tables, tool_input)
+
+
+def get_schema(table_names: str) -> str:
+    """
+    Get the schema and sample rows for the specified SQL tables.
+    Input is a comma-separated list of the table names, for example: 'table1, table2, table3'.
+    Be sure that the tables actually exist by calling sql_db_list_tables first!
+    """
+    return catalog.get_table_info_no_throw(
+        [name.strip() for name in table_names.split(",") if name.strip()]
+    )
+
+
+async def aget_schema(table_names: str) -> str:
+    return await run_in_db_thread(get_schema, table_names)
+
+
+# Each tool has a coroutine that offloads the blocking database call to the
+# DB_THREADS pool, so the async graph never blocks the event loop.
+list_tables_tool = StructuredTool.from_function(
+    func=list_tables, coroutine=alist_tables, name="sql_db_list_tables"
+)
+get_schema_tool = StructuredTool.from_function(
+    func=get_schema, coroutine=aget_schema, name="sql_db_schema"
+)
+
+
+def execute_sql(query: str) -> Tuple[str, Optional[dict]]:
+    """
+    Runs a read-only query through the result cache.
+
+    Parameters:
+        query (str): The SQL query.
+
+    Returns:
+        tuple: The rows as text (or an error message starting with "Error:") and
+            an artifact with the column names and rendered rows (None on errors).
+    """
+    error = read_only_error(query)
+    if error:
+        return error, None
+
+    cached = query_cache.lookup(query)
+    if cached is not None:
+        return cached
+
+    version = data_version()
+    engine = get_engine()
+    result = engine.run_query(query)
+    if not result.text:
+        return "Error: Query failed. Please rewrite your query and try again.", None
+    if result.text.startswith("Error:"):
+        return result.text, None
+    artifact = {
+        "columns": result.columns,
+        "rows": [list(row) for row in result.rows],
+        "row_count": result.row_count,
+        "truncated": result.truncated,
+    }
+    query_cache.put(query, result.text, version, artifact)
+    if engine.name == "sqlite":
+        # Only SQLite tables can be indexed; DuckDB scans Parquet files.
+        index_advisor.observe(query)
+    return result.text, artifact
+
+
+def db_query(query: str) -> Tuple[str, Optional[dict]]:
     """
     Run a SQL query on the database and retrieve the result.
     If the query is incorrect, an error message will be provided.
     In case of an error, modify the query, check the query, and attempt to run the query again.
     """
-    result = db.run_no_throw(query)
-    if not result:
-        return "Error: Query failed. Please rewrite your query and try again."
-    return result
+    # The artifact is not sent to the LLM; give_final_answer and the app use it.
+    return execute_sql(query)
+
+
+async def adb_query(query: str) -> Tuple[str, Optional[dict]]:
+    return await run_in_db_thread(execute_sql, query)
+
+
+db_query_tool = StructuredTool.from_function(
+    func=db_query,
+    coroutine=adb_query,
+    name="db_query_tool",
+    response_format="content_and_artifact",
+)
+
+
+def _run_candidate(query: str) -> Tuple[str, Optional[dict]]:
+    validation = validate_sql(query)
+    if not validation.ok:
+        return validation.error, None
+    return execute_sql(query)
+
+
+def execute_candidates(
+    queries: List[str],
+) -> Tuple[Optional[int], List[Tuple[str, Optional[dict]]]]:
+    """
+    Validates and runs candidate queries in parallel and picks the first success.
+
+    Every candidate runs on its own read-only connection with its own time
+    limit (QUERY_TIMEOUT_SECONDS). The first candidate to finish with a
+    non-empty, error-free result wins; the others are not waited for.
+
+    Parameters:
+        queries (list): The candidate SQL queries.
+
+    Returns:
+        tuple: Index of the winning query (or None if all failed) and the
+            (result, artifact) pairs received so far, one per query
+            (("", None) if still running).
+    """
+    results = [("", None)] * len(queries)
+    if not queries:
+        return None, results
+    pool = ThreadPoolExecutor(
+        max_workers=len(queries), thread_name_prefix="sql-candidate"
+    )
+    try:
+        futures = {
+            pool.submit(_run_candidate, query): i for i, query in enumerate(queries)
+        }
+        for future in as_completed(futures):
+            i = futures[future]
+            try:
+                results[i] = future.result()
+            except Exception as e:
+                results[i] = (f"Error: {repr(e)}", None)
+            if not results[i][0].startswith("Error:"):
+                return i, results
+        return None, results
+    finally:
+        # Slower candidates finish in the background, bounded by their time limit.
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+async def aexecute_candidates(
+    queries: List[str],
+) -> Tuple[Optional[int], List[Tuple[str, Optional[dict]]]]:
+    """
+    Async version of ``execute_candidates``. The candidates run on the database
+    thread pool; once one succeeds, the candidates that have not started yet are
+    cancelled.
+    """
+    results = [("", None)] * len(queries)
+    if not queries:
+        return None, results
+    tasks = {
+        asyncio.ensure_future(run_in_db_thread(_run_candidate, query)): i
+        for i, query in enumerate(queries)
+    }
+    pending = set(tasks)
+    try:
+        while pending:
+            done, pending = await asyncio.wait(
+                pending, return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in done:
+                i = tasks[task]
+                try:
+                    results[i] = task.result()
+                except Exception as e:
+                    results[i] = (f"Error: {repr(e)}", None)
+            winners = [
+                tasks[task]
+                for task in done
+                if not results[tasks[task]][0].startswith("Error:")
+            ]
+            if winners:
+                return min(winners), results
+        return None, results
+    finally:
+        for task in pending:
+            task.cancel()
 
 
 def create_tool_node_with_fallback(tools: list) -> RunnableWithFallbacks[Any, dict]:
@@ -0,0 +1,296 @@
+import json
+import os
+import threading
+import time
+import uuid
+from collections import defaultdict
+from typing import Any, Dict, List, Optional
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+# Runnables traced as spans besides the graph nodes (see src/chains.py).
+TRACED_CHAINS = {
+    "query_checker_chain",
+    "query_generator_chain",
+    "query_candidates_chain",
+    "get_schema_chain",
+    "final_answer_chain",
+    "table_chain",
+}
+LATENCY_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+class MetricsRegistry:
+    """
+    Process-wide aggregates of the spans of all traced requests, rendered in
+    the Prometheus text exposition format.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._latency = defaultdict(lambda: [0] * len(LATENCY_BUCKETS))
+        self._latency_sum = defaultdict(float)
+        self._latency_count = defaultdict(int)
+        self._tokens = defaultdict(int)
+        self._errors = defaultdict(int)
+
+    def observe(self, kind: str, name: str, seconds: float) -> None:
+        key = (kind, name)
+        with self._lock:
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if seconds <= bound:
+                    self._latency[key][i] += 1
+            self._latency_sum[key] += seconds
+            self._latency_count[key] += 1
+
+    def record_request(self, request: dict) -> None:
+        """
+        Adds the spans of a finished request to the aggregates.
+        """
+        self.observe("request", "graph", request["seconds"])
+        for span in request["spans"]:
+            self.observe(span["kind"], span["name"], span["seconds"])
+            with self._lock:
+                key = (span["kind"], span["name"])
+                self._tokens[key + ("prompt",)] += span["prompt_tokens"]
+                self._tokens[key + ("completion",)] += span["completion_tokens"]
+                if span.get("error"):
+                    self._errors[key] += 1
+
+    def render_prometheus(self) -> str:
+        """
+        Renders the metrics in the Prometheus text exposition format.
+
+        Returns:
+            str: The metrics text.
+        """
+        lines = [
+            "# HELP sql_agent_span_seconds Wall time of requests, graph nodes, chains and tools.",
+            "# TYPE sql_agent_span_seconds histogram",
+        ]
+        with self._lock:
+            for (kind, name), buckets in sorted(self._latency.items()):
+                labels = f'kind="{kind}",name="{name}"'
+                for bound, count in zip(LATENCY_BUCKETS, buckets):
+                    lines.append(
+                        f'sql_agent_span_seconds_bucket{{{labels},le="{bound}"}} {count}'
+                    )
+                lines.append(
+                    f'sql_agent_span_seconds_bucket{{{labels},le="+Inf"}} '
+                    f"{self._latency_count[(kind, name)]}"
+                )
+                lines.append(
+                    f"sql_agent_span_seconds_sum{{{labels}}} "
+                    f"{self._latency_sum[(kind, name)]}"
+                )
+                lines.append(
+                    f"sql_agent_span_seconds_count{{{labels}}} "
+                    f"{self._latency_count[(kind, name)]}"
+                )
+            lines += [
+                "# HELP sql_agent_tokens_total LLM tokens used by graph nodes and chains.",
+                "# TYPE sql_agent_tokens_total counter",
+            ]
+            for (kind, name, token_type), count in sorted(self._tokens.items()):
+                lines.append(
+                    f'sql_agent_tokens_total{{kind="{kind}",name="{name}",'
+                    f'type="{token_type}"}} {count}'
+                )
+            lines += [
+                "# HELP sql_agent_span_errors_total Spans that raised an error.",
+                "# TYPE sql_agent_span_errors_total counter",
+            ]
+            for (kind, name), count in sorted(self._errors.items()):
+                lines.append(
+                    f'sql_agent_span_errors_total{{kind="{kind}",name="{name}"}} {count}'
+                )
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+
+
+class RequestTracer(BaseCallbackHandler):
+    """
+    Callback handler that records one span per graph node, traced chain and tool
+    call of a single graph invocation.
+
+    Spans carry their wall time, the prompt and completion tokens of the LLM
+    calls made inside them and the iteration of the generate_query loop they
+    belong to. Tool spans of db_query_tool hold the SQL execution time. When
+    the invocation finishes, the request is appended to TRACE_JSONL_PATH and
+    added to the process-wide metrics (also written to PROMETHEUS_TEXTFILE_PATH).
+
+    Pass a new instance per request: ``graph.stream(..., config={"callbacks": [tracer]})``.
+    """
+
+    # Handle events on the calling thread, also for async runs of the graph.
+    run_inline = True
+
+    def __init__(self, request_id: Optional[str] = None):
+        self.request_id = request_id or uuid.uuid4().hex
+        self.started_at: Optional[float] = None
+        self.seconds: Optional[float] = None
+        self.spans: List[dict] = []
+        self.iteration = 0
+        self._lock = threading.Lock()
+        self._parents: Dict[UUID, Optional[UUID]] = {}
+        self._open: Dict[UUID, dict] = {}
+        self._root: Optional[UUID] = None
+
+    def _start(self, run_id: UUID, parent_run_id: Optional[UUID], kind, name, **attrs):
+        with self._lock:
+            self._parents[run_id] = parent_run_id
+            if self._root is None:
+                self._root = run_id
+                self.started_at = time.time()
+            if kind is None:
+                return
+            if kind == "node" and name == "generate_query":
+                self.iteration += 1
+            self._open[run_id] = {
+                "kind": kind,
+                "name": name,
+                "iteration": self.iteration,
+                "start": time.time(),
+                "prompt_tokens": 0,
+                "completion_tokens": 0,
+                "prompt_chars": 0,
+                **attrs,
+            }
+
+    def _end(self, run_id: UUID, error: Optional[BaseException] = None) -> None:
+        with self._lock:
+            span = self._open.pop(run_id, None)
+            if span is not None:
+                span["seconds"] = time.time() - span["start"]
+                if error is not None:
+                    span["error"] = repr(error)
+                self.spans.append(span)
+            finished = run_id == self._root
+        if finished:
+            self._finish()
+
+    def _traced_ancestors(self, run_id: Optional[UUID]):
+        while run_id is not None:
+            if run_id in self._open:
+                yield self._open[run_id]
+            run_id = self._parents.get(run_id)
+
+    def on_chain_start(
+        self,
+        serialized: Optional[dict],
+        inputs: Any,
+        *,
+        run_id: UUID,
+        parent_run_id: Optional[UUID] = None,
+        metadata: Optional[dict] = None,
+        **kwargs: Any,
+    ) -> None:
+        name = kwargs.get("name") or (serialized or {}).get("name")
+        if (
+            parent_run_id is not None
+            and name == (metadata or {}).get("langgraph_node")
+            and not name.startswith("__")
+            # Nodes added as a RunnableLambda start a nested run of the same name.
+            and self._open.get(parent_run_id, {}).get("name") != name
+        ):
+            kind = "node"
+        elif name in TRACED_CHAINS:
+            kind = "chain"
+        else:
+            kind = None
+        self._start(run_id, parent_run_id, kind, name)
+
+    def on_chain_end(self, outputs: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        self._end(run_id)
+
+    def on_chain_error(
+        self, error: BaseException, *, run_id: UUID, **kwargs: Any
+    ) -> None:
+        self._end(run_id, error)
+
+    def on_tool_start(
+        self,
+        serialized: Optional[dict],
+        input_str: str,
+        *,
+        run_id: UUID,
+        parent_run_id: Optional[UUID] = None,
+        **kwargs: Any,
+    ) -> None:
+        name = kwargs.get("name") or (serialized or {}).get("name")
+        self._start(run_id, parent_run_id, "tool", name)
+
+    def on_tool_end(self, output: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        self._end(run_id)
+
+    def on_tool_error(
+        self, error: BaseException, *, run_id: UUID, **kwargs: Any
+    ) -> None:
+        self._end(run_id, error)
+
+    def on_chat_model_start(
+        self,
+        serialized: Optional[dict],
+        messages: list,
+        *,
+        run_id: UUID,
+        parent_run_id: Optional[UUID] = None,
+        **kwargs: Any,
+    ) -> None:
+        prompt_chars = sum(len(str(m.content)) for batch in messages for m in batch)
+        with self._lock:
+            self._parents[run_id] = parent_run_id
+            for span in self._traced_ancestors(parent_run_id):
+                span["prompt_chars"] += prompt_chars
+
+    def on_llm_end(
+        self,
+        response: Any,
+        *,
+        run_id: UUID,
+        parent_run_id: Optional[UUID] = None,
+        **kwargs: Any,
+    ) -> None:
+        prompt_tokens = completion_tokens = 0
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(
+                    getattr(generation, "message", None), "usage_metadata", None
+                )
+                if usage:
+                    prompt_tokens += usage.get("input_tokens", 0)
+                    completion_tokens += usage.get("output_tokens", 0)
+        with self._lock:
+            for span in self._traced_ancestors(parent_run_id):
+                span["prompt_tokens"] += prompt_tokens
+                span["completion_tokens"] += completion_tokens
+
+    def to_dict(self) -> dict:
+        """
+        Returns the request and its spans as a JSON-serializable dict.
+        """
+        with self._lock:
+            spans = sorted(self.spans, key=lambda span: span["start"])
+        return {
+            "request_id": self.request_id,
+            "started_at": self.started_at,
+            "seconds": self.seconds,
+            "iterations": self.iteration,
+            "spans": spans,
+        }
+
+    def _finish(self) -> None:
+        self.seconds = time.time() - self.started_at
+        request = self.to_dict()
+        metrics.record_request(request)
+        if os.getenv("TRACE_JSONL_PATH"):
+            with open(os.getenv("TRACE_JSONL_PATH"), "a", encoding="utf-8") as f:
+                f.write(json.dumps(request) + "\n")
+        if os.getenv("PROMETHEUS_TEXTFILE_PATH"):
+            with open(
+                os.getenv("PROMETHEUS_TEXTFILE_PATH"), "w", encoding="utf-8"
+            ) as f:
+                f.write(metrics.render_prometheus())
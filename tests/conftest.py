@@ -0,0 +1,27 @@
+import pytest
+
+from src.catalog import catalog
+from src.db import reset_db
+from src.engines import close_engines
+from src.query_cache import query_cache
+from src.retriever import retriever
+from src.sql_memo import sql_memo
+
+
+@pytest.fixture
+def app_db(tmp_path, monkeypatch):
+    """
+    Points the app at an empty SQLite database in a temporary directory.
+    """
+    db_path = str(tmp_path / "app.db")
+    monkeypatch.delenv("SQL_SAMPLE_DB_URI", raising=False)
+    monkeypatch.delenv("SQL_ENGINE", raising=False)
+    monkeypatch.setenv("SQL_DB_PATH_VAR", db_path)
+    reset_db()
+    yield db_path
+    reset_db()
+    close_engines()
+    catalog.reset()
+    retriever.reset()
+    sql_memo.clear()
+    query_cache.invalidate()
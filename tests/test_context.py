@@ -0,0 +1,71 @@
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
+
+from src.context import build_context
+
+
+def _tool_exchange(name: str, args: dict, result: str, call_id: str) -> list:
+    return [
+        AIMessage(content="", tool_calls=[{"name": name, "args": args, "id": call_id}]),
+        ToolMessage(content=result, name=name, tool_call_id=call_id),
+    ]
+
+
+def _turn(question: str, failed_attempts: int) -> list:
+    messages = [HumanMessage(content=question)]
+    messages += _tool_exchange("sql_db_list_tables", {}, "orders", "l")
+    messages += _tool_exchange(
+        "sql_db_schema", {"table_names": "orders"}, "CREATE TABLE orders (...)", "s"
+    )
+    for i in range(failed_attempts):
+        messages.append(AIMessage(content=f"SELECT total_{i} FROM orders"))
+        messages += _tool_exchange(
+            "db_query_tool",
+            {"query": f"SELECT total_{i} FROM orders"},
+            f"Error: no such column: total_{i} " + "x" * 400,
+            f"q{i}",
+        )
+    return messages
+
+
+def _tool_calls_are_answered(context: list) -> bool:
+    call_ids = {
+        tc["id"] for m in context if isinstance(m, AIMessage) for tc in m.tool_calls
+    }
+    result_ids = {m.tool_call_id for m in context if isinstance(m, ToolMessage)}
+    return call_ids == result_ids
+
+
+def test_question_schema_and_latest_attempt_are_kept():
+    messages = _turn("Total of all orders?", failed_attempts=6)
+
+    context = build_context(messages, token_budget=600, keep_exchanges=3)
+
+    assert isinstance(context[0], SystemMessage)
+    assert "Earlier attempts for the current question:" in context[0].content
+    assert context[1] is messages[0]
+    assert any(m.content == "CREATE TABLE orders (...)" for m in context)
+    assert context[-1] is messages[-1]
+    assert "sql_db_list_tables" not in str(context)
+    assert _tool_calls_are_answered(context)
+
+
+def test_tool_calls_keep_their_results_at_any_budget():
+    messages = _turn("Total?", failed_attempts=4)
+
+    for token_budget in (0, 50, 150, 300, 600, 10000):
+        context = build_context(messages, token_budget=token_budget, keep_exchanges=10)
+        assert any(m is messages[0] for m in context)
+        assert _tool_calls_are_answered(context)
+
+
+def test_earlier_turns_are_summarized():
+    earlier = _turn("How many orders?", failed_attempts=0) + [
+        AIMessage(content="There are 12 orders.")
+    ]
+    messages = earlier + _turn("And their total?", failed_attempts=1)
+
+    context = build_context(messages, token_budget=4000, keep_exchanges=3)
+
+    assert "Q: How many orders? A: There are 12 orders." in context[0].content
+    assert context[1] is messages[len(earlier)]
+    assert not any(m is c for m in earlier for c in context)
@@ -0,0 +1,54 @@
+import sqlite3
+
+import pandas as pd
+import pytest
+
+from src.engines import close_engines, get_engine
+from src.sql_utils import delete_db, write_chunks_to_sqlite
+
+pytest.importorskip("duckdb")
+
+
+def _ingest(db_path, table_name, **columns):
+    write_chunks_to_sqlite(iter([pd.DataFrame(columns)]), db_path, table_name)
+
+
+def _count(db_path, table_name):
+    return get_engine(db_path).run_query(f"SELECT count(*) FROM {table_name}").rows
+
+
+def test_duckdb_copy_follows_inserts(app_db, monkeypatch):
+    monkeypatch.setenv("SQL_ENGINE", "duckdb")
+    _ingest(app_db, "t1", id=[1, 2])
+    _ingest(app_db, "t2", id=[1, 2, 3])
+    assert _count(app_db, "t2") == [(3,)]
+
+    with sqlite3.connect(app_db) as conn:
+        conn.execute("INSERT INTO t2 VALUES (4)")
+    assert _count(app_db, "t2") == [(4,)]
+
+    # The manifest outlives the engine, so unchanged tables are not copied again.
+    close_engines()
+    t1_dir = get_engine(app_db).data_dir / "t1"
+    copied_at = t1_dir.stat().st_ino, t1_dir.stat().st_mtime_ns
+    with sqlite3.connect(app_db) as conn:
+        conn.execute("CREATE INDEX idx_t2_id ON t2 (id)")
+    assert _count(app_db, "t1") == [(2,)]
+    assert (t1_dir.stat().st_ino, t1_dir.stat().st_mtime_ns) == copied_at
+
+
+def test_engine_is_chosen_per_database(app_db, tmp_path, monkeypatch):
+    monkeypatch.setenv("SQL_ENGINE", "duckdb")
+    _ingest(app_db, "t1", id=[1])
+    other_db = str(tmp_path / "other.db")
+    monkeypatch.setenv("SQL_ENGINE", "sqlite")
+    _ingest(other_db, "t1", id=[1])
+
+    assert get_engine(app_db).name == "duckdb"
+    assert get_engine(other_db).name == "sqlite"
+    close_engines()
+    assert get_engine(app_db).name == "duckdb"
+
+    # A new database at the same path takes SQL_ENGINE again.
+    delete_db(app_db)
+    assert get_engine(app_db).name == "sqlite"
@@ -0,0 +1,55 @@
+import sqlite3
+
+import pytest
+
+from src.executor import run_query_result
+
+
+@pytest.fixture
+def big_table(app_db):
+    with sqlite3.connect(app_db) as conn:
+        conn.execute("CREATE TABLE big (id INTEGER, label TEXT)")
+        conn.execute(
+            "INSERT INTO big WITH RECURSIVE n(i) AS "
+            "(SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < 200000) "
+            "SELECT i, 'row ' || i FROM n"
+        )
+    return app_db
+
+
+def test_truncated_result_stops_fetching(big_table):
+    # Scanning the whole table takes millions of VM steps; ten rows do not.
+    result = run_query_result(
+        "SELECT * FROM big", max_rows=10, timeout_seconds=0, max_vm_steps=50000
+    )
+
+    assert result.truncated
+    assert result.rows == [(i, f"row {i}") for i in range(1, 11)]
+    assert result.text.startswith("[(1, 'row 1'), ")
+    assert "Result truncated: showing the first 10 rows" in result.text
+
+
+def test_byte_cap_truncates_result(big_table):
+    result = run_query_result("SELECT * FROM big", max_rows=100, max_bytes=50)
+
+    assert result.truncated
+    assert 0 < len(result.rows) < 100
+
+
+def test_runaway_query_is_cancelled(big_table):
+    result = run_query_result(
+        "SELECT count(*) FROM big a, big b", timeout_seconds=0, max_vm_steps=100000
+    )
+
+    assert result.text.startswith("Error: Query cancelled after ")
+    assert "the 100000 VM step limit" in result.text
+    assert result.rows == [] and not result.truncated
+
+
+def test_query_is_cancelled_at_the_deadline(big_table):
+    result = run_query_result("SELECT count(*) FROM big a, big b", timeout_seconds=0.2)
+
+    assert result.text.startswith("Error: Query cancelled after ")
+    assert "the 0.2s time limit" in result.text
+    # The pooled connection keeps serving queries after the cancellation.
+    assert run_query_result("SELECT count(*) FROM big").rows == [(200000,)]
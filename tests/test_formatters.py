@@ -0,0 +1,22 @@
+from src.formatters import format_result
+
+
+def _answer(columns, rows):
+    return format_result({"columns": columns, "rows": rows}, max_rows=20)
+
+
+def test_small_and_large_values_keep_their_digits():
+    assert _answer(["avg(rate)"], [(0.004,)]) == "Avg of rate: **0.004**"
+    assert _answer(["total"], [(1234567.891,)]) == "Total: **1234567.891**"
+    assert _answer(["total"], [(123456.78,)]) == "Total: **123456.78**"
+    assert _answer(["total"], [(99999.995,)]) == "Total: **99999.995**"
+    assert _answer(["total"], [(250.0,)]) == "Total: **250**"
+    assert _answer(["amount"], [(12.5,)]) == "Amount: **12.5**"
+
+
+def test_larger_results_are_left_to_the_llm():
+    assert _answer(["id"], [(i,) for i in range(21)]) is None
+    assert (
+        format_result({"columns": ["id"], "rows": [(1,), (2,)], "truncated": True})
+        is None
+    )
@@ -0,0 +1,72 @@
+import io
+import sqlite3
+
+import pandas as pd
+import pytest
+
+from src.engines import get_engine
+from src.sql_utils import ingest_csv_files, write_chunks_to_sqlite
+
+
+def _ingest_csv(db_path, text, chunksize):
+    with pd.read_csv(io.StringIO(text), chunksize=chunksize) as reader:
+        write_chunks_to_sqlite(reader, db_path, "sales")
+
+
+def _column(db_path, query):
+    with sqlite3.connect(db_path) as conn:
+        return conn.execute(query).fetchall()
+
+
+@pytest.mark.parametrize("chunksize", [1, 2, 10])
+def test_column_is_widened_to_text(app_db, chunksize):
+    _ingest_csv(app_db, "id,amount\n1,2\n2,3\n3,4.5\n4,x\n", chunksize)
+
+    assert _column(app_db, 'SELECT type FROM pragma_table_info("sales")') == [
+        ("INTEGER",),
+        ("TEXT",),
+    ]
+    assert _column(app_db, "SELECT DISTINCT typeof(amount) FROM sales") == [("text",)]
+    assert _column(app_db, "SELECT amount FROM sales WHERE id = 4") == [("x",)]
+
+
+@pytest.mark.parametrize("chunksize", [1, 2, 10])
+def test_column_is_widened_to_real(app_db, chunksize):
+    _ingest_csv(app_db, "id,amount\n1,2\n2,3\n3,4.5\n", chunksize)
+
+    assert _column(app_db, 'SELECT type FROM pragma_table_info("sales")') == [
+        ("INTEGER",),
+        ("REAL",),
+    ]
+    assert _column(app_db, "SELECT DISTINCT typeof(amount) FROM sales") == [("real",)]
+    assert _column(app_db, "SELECT sum(amount) FROM sales") == [(9.5,)]
+    assert _column(
+        app_db,
+        "SELECT type, min_value, max_value FROM _column_stats "
+        "WHERE column_name = 'amount'",
+    ) == [("REAL", 2.0, 4.5)]
+
+
+def test_duckdb_copy_follows_widened_columns(app_db, monkeypatch):
+    pytest.importorskip("duckdb")
+    monkeypatch.setenv("SQL_ENGINE", "duckdb")
+    _ingest_csv(app_db, "id,amount\n1,2\n2,3\n3,4.5\n", 2)
+
+    result = get_engine(app_db).run_query("SELECT sum(amount) FROM sales")
+    assert result.rows == [(9.5,)]
+
+
+def test_csv_files_are_streamed_to_their_tables(app_db):
+    rows = "".join(f"{i},{i * 2}\n" for i in range(25))
+    summary = ingest_csv_files(
+        [("First File.csv", f"id,value\n{rows}".encode()), ("bad.csv", b'"a\n')],
+        app_db,
+        max_workers=2,
+        chunksize=4,
+    )
+
+    first, bad = summary["files"]
+    assert first["table_name"] == "first_file" and first["rows"] == 25
+    assert "error" in bad
+    assert _column(app_db, "SELECT count(*), sum(value) FROM first_file") == [(25, 600)]
+    assert _column(app_db, "SELECT name FROM sqlite_master WHERE name = 'bad'") == []
@@ -0,0 +1,87 @@
+import pandas as pd
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+from src.nodes import _final_answer_inputs
+from src.routers import route_start
+from src.sql_memo import sql_memo
+from src.sql_utils import write_chunks_to_sqlite
+
+
+def _query(query: str, result: str, call_id: str) -> list:
+    return [
+        AIMessage(
+            content="",
+            tool_calls=[
+                {"name": "db_query_tool", "args": {"query": query}, "id": call_id}
+            ],
+        ),
+        ToolMessage(content=result, name="db_query_tool", tool_call_id=call_id),
+    ]
+
+
+def _state(question: str, messages: list) -> dict:
+    return {
+        "messages": [HumanMessage(content=question), *messages],
+        "question": question,
+        "attempts": 5,
+        "deadline": 0.0,
+        "tokens_used": 0,
+    }
+
+
+def test_submitted_answer_is_memoized(app_db):
+    write_chunks_to_sqlite(iter([pd.DataFrame({"amount": [1.0]})]), app_db, "t")
+    submit = AIMessage(
+        content="",
+        tool_calls=[
+            {"name": "SubmitFinalAnswer", "args": {"final_answer": "1"}, "id": "s"}
+        ],
+    )
+    state = _state(
+        "Average amount in t?", _query('SELECT AVG(amount) FROM "t"', "[(1.0,)]", "a")
+    )
+    state["messages"].append(submit)
+
+    _final_answer_inputs(state)
+
+    assert sql_memo.get("Average amount in t?") == 'SELECT AVG(amount) FROM "t"'
+
+
+def test_partial_answer_is_not_memoized(app_db, monkeypatch):
+    write_chunks_to_sqlite(iter([pd.DataFrame({"amount": [1.0]})]), app_db, "t")
+    monkeypatch.setenv("AGENT_MAX_ATTEMPTS", "5")
+    messages = _query('SELECT category FROM "t" LIMIT 1', "[('a',)]", "a")
+    for i in range(4):
+        messages += _query("SELECT AVG(amt) FROM t", "Error: no such column", f"e{i}")
+    messages.append(AIMessage(content="SELECT AVG(amount) FROM t"))
+
+    answer, inputs = _final_answer_inputs(_state("Average amount in t?", messages))
+
+    assert "Partial result" in inputs["sql_result"]
+    assert sql_memo.get("Average amount in t?") is None
+
+
+def test_follow_up_questions_are_not_memoized(app_db):
+    write_chunks_to_sqlite(iter([pd.DataFrame({"amount": [1.0]})]), app_db, "t")
+    sql_memo.put("And for 2023?", 'SELECT AVG(amount) FROM "t"')
+    earlier_turn = [
+        HumanMessage(content="Average amount in 2022?"),
+        AIMessage(content="1.0"),
+    ]
+    state = _state("And for 2023?", _query('SELECT 2 FROM "t"', "[(2,)]", "a"))
+    state["messages"] = earlier_turn + state["messages"]
+    state["messages"].append(
+        AIMessage(
+            content="",
+            tool_calls=[
+                {"name": "SubmitFinalAnswer", "args": {"final_answer": "2"}, "id": "s"}
+            ],
+        )
+    )
+
+    assert route_start({"messages": state["messages"][:3]}) != "use_cached_sql"
+    _final_answer_inputs(state)
+    assert sql_memo.get("And for 2023?") == 'SELECT AVG(amount) FROM "t"'
+    assert route_start({"messages": [HumanMessage(content="And for 2023?")]}) == (
+        "use_cached_sql"
+    )
@@ -0,0 +1,48 @@
+import sqlite3
+
+import pandas as pd
+
+from src.query_cache import QueryResultCache, query_cache
+from src.sql_utils import write_chunks_to_sqlite
+
+
+def _ingest(db_path, table_name, if_exists="fail", **columns):
+    write_chunks_to_sqlite(
+        iter([pd.DataFrame(columns)]), db_path, table_name, if_exists=if_exists
+    )
+
+
+def test_result_is_reused_until_the_data_changes(app_db):
+    _ingest(app_db, "t", id=[1, 2])
+    query_cache.put("SELECT count(*) FROM t", "[(2,)]")
+    assert query_cache.get("SELECT  count(*)\n  FROM t;") == "[(2,)]"
+
+    with sqlite3.connect(app_db) as conn:
+        conn.execute("INSERT INTO t VALUES (3)")
+
+    assert query_cache.get("SELECT count(*) FROM t") is None
+
+
+def test_reingested_table_drops_its_results(app_db):
+    _ingest(app_db, "t", id=[1, 2])
+    _ingest(app_db, "other", id=[1])
+    query_cache.put("SELECT count(*) FROM t", "[(2,)]")
+    query_cache.put("SELECT count(*) FROM other", "[(1,)]")
+
+    _ingest(app_db, "t", if_exists="replace", id=[1, 2, 3])
+
+    assert query_cache.stats()["entries"] == 1
+    # The remaining entry was computed before the upload, so it misses too.
+    assert query_cache.get("SELECT count(*) FROM other") is None
+
+
+def test_least_recently_used_results_are_evicted(app_db):
+    cache = QueryResultCache(max_bytes=60)
+    cache.put("SELECT 1", "a" * 20)
+    cache.put("SELECT 2", "b" * 20)
+    cache.get("SELECT 1")
+    cache.put("SELECT 3", "c" * 20)
+
+    assert cache.get("SELECT 1") == "a" * 20
+    assert cache.get("SELECT 2") is None
+    assert cache.stats()["evictions"] == 1
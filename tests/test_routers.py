@@ -0,0 +1,98 @@
+import time
+from types import SimpleNamespace
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+from src.nodes import _candidate_queries, _speculative_result
+from src.budget import budget_exhausted, start_budget
+from src.routers import after_execute_query, after_speculative_query, should_continue
+
+
+def _schema_state() -> dict:
+    return {
+        "messages": [
+            HumanMessage(content="How many customers?"),
+            AIMessage(
+                content="",
+                tool_calls=[{"name": "sql_db_schema", "args": {}, "id": "s"}],
+            ),
+            ToolMessage(
+                content="CREATE TABLE customers (id INTEGER)",
+                name="sql_db_schema",
+                tool_call_id="s",
+            ),
+        ],
+        "question": "",
+        "attempts": 0,
+        "deadline": 0.0,
+        "tokens_used": 0,
+    }
+
+
+def test_no_candidates_fall_back_to_generate_query():
+    state = _schema_state()
+    response = {"parsed": None, "raw": AIMessage(content="")}
+    queries = _candidate_queries(response)
+
+    update = _speculative_result(
+        state, "How many customers?", response, queries, None, []
+    )
+    state = {**state, **update, "messages": state["messages"] + update["messages"]}
+
+    assert queries == [] and update["messages"] == []
+    assert after_speculative_query(state) == "generate_query"
+
+
+def test_empty_candidate_list_falls_back_to_generate_query():
+    state = _schema_state()
+    response = {"parsed": SimpleNamespace(queries=[]), "raw": AIMessage(content="")}
+
+    update = _speculative_result(state, "How many customers?", response, [], None, [])
+    state = {**state, **update, "messages": state["messages"] + update["messages"]}
+
+    assert after_speculative_query(state) == "generate_query"
+
+
+def _query_state(result: str, **budget) -> dict:
+    state = _schema_state()
+    state["messages"] += [
+        AIMessage(
+            content="",
+            tool_calls=[
+                {"name": "db_query_tool", "args": {"query": "SELECT 1"}, "id": "q"}
+            ],
+        ),
+        ToolMessage(content=result, name="db_query_tool", tool_call_id="q"),
+    ]
+    return {**state, **budget}
+
+
+def test_errors_are_retried_while_budget_is_left(monkeypatch):
+    monkeypatch.setenv("AGENT_MAX_ATTEMPTS", "3")
+    monkeypatch.setenv("AGENT_MAX_TOKENS", "1000")
+
+    assert should_continue(_query_state("Error: boom", attempts=2)) == "generate_query"
+    assert should_continue(_query_state("[(1,)]", attempts=2)) == "correct_query"
+
+
+def test_exhausted_budget_goes_to_the_final_answer(monkeypatch):
+    monkeypatch.setenv("AGENT_MAX_ATTEMPTS", "3")
+    monkeypatch.setenv("AGENT_MAX_TOKENS", "1000")
+
+    assert budget_exhausted(_query_state("Error: boom", attempts=3))
+    for budget in (
+        {"attempts": 3},
+        {"deadline": time.time() - 1},
+        {"tokens_used": 1000},
+    ):
+        state = _query_state("Error: boom", **budget)
+        assert should_continue(state) == "give_final_answer"
+        assert after_execute_query(state) == "give_final_answer"
+
+
+def test_budget_starts_once_per_request(monkeypatch):
+    monkeypatch.setenv("AGENT_DEADLINE_SECONDS", "60")
+
+    budget = start_budget({"deadline": 0.0})
+    assert budget["attempts"] == 0 and budget["deadline"] > time.time()
+    assert start_budget({"deadline": budget["deadline"]}) == {}
@@ -0,0 +1,71 @@
+import os
+
+import pandas as pd
+
+from src.catalog import catalog
+from src.db import reset_db
+from src.index_advisor import index_advisor
+from src.retriever import retriever
+from src.sql_memo import sql_memo
+from src.sql_utils import delete_db, write_chunks_to_sqlite
+
+
+def _ingest(db_path, table_name, **columns):
+    write_chunks_to_sqlite(iter([pd.DataFrame(columns)]), db_path, table_name)
+
+
+def test_retriever_follows_delete_and_reupload(app_db):
+    _ingest(app_db, "customers", customer=["ann", "bob"])
+    assert retriever.get_relevant_tables("which customers") == ["customers"]
+    version = catalog.schema_version()
+
+    delete_db(app_db)
+    _ingest(app_db, "products", product=["pen", "ink"])
+
+    # The new database reaches the same schema version as the deleted one.
+    assert catalog.schema_version() == version
+    assert retriever.get_relevant_tables("which products") == ["products"]
+    assert "products" in catalog.get_table_info(["products"])
+
+
+def test_memo_is_dropped_with_the_database(app_db):
+    _ingest(app_db, "customers", customer=["ann", "bob"])
+    sql_memo.put("Which customers?", "SELECT customer FROM customers")
+    assert sql_memo.get("which customers") == "SELECT customer FROM customers"
+
+    delete_db(app_db)
+    _ingest(app_db, "customers_v2", customer=["cy"])
+    assert sql_memo.get("which customers") is None
+
+
+def test_memo_entry_is_bound_to_its_database(app_db):
+    _ingest(app_db, "customers", customer=["ann", "bob"])
+    sql_memo.put("Which customers?", "SELECT customer FROM customers")
+
+    # A new connection to a new database file, without delete_db.
+    reset_db()
+    os.remove(app_db)
+    _ingest(app_db, "products", product=["pen"])
+    assert sql_memo.get("which customers") is None
+
+
+def test_auto_index_keeps_schema_caches(app_db):
+    _ingest(app_db, "orders", region=["north", "south"], amount=[1, 2])
+    sql_memo.put("Total amount by region?", 'SELECT region, SUM(amount) FROM "orders"')
+    catalog.get_usable_table_names()
+    retriever.get_relevant_tables("orders by region")
+    key = catalog.schema_key()
+    version = catalog.schema_version()
+
+    recommendation = index_advisor.create_index("orders", "region")
+
+    assert "error" not in recommendation
+    assert catalog.schema_version() > version
+    assert catalog.schema_key() == key
+    assert catalog.is_warm()
+    assert sql_memo.get("total amount by region") is not None
+
+    # Later schema changes are still seen.
+    _ingest(app_db, "returns", amount=[1])
+    assert catalog.schema_key() != key
+    assert "returns" in catalog.get_usable_table_names()
@@ -0,0 +1,56 @@
+import pandas as pd
+import pytest
+
+from src.sql_utils import write_chunks_to_sqlite
+from src.sql_validator import extract_sql, validate_sql
+
+
+@pytest.fixture
+def orders_db(app_db):
+    write_chunks_to_sqlite(
+        iter([pd.DataFrame({"id": [1, 2], "amount": [9.5, 3.0]})]), app_db, "orders"
+    )
+    return app_db
+
+
+@pytest.mark.parametrize(
+    "query",
+    [
+        "DELETE FROM orders",
+        "UPDATE orders SET amount = 0",
+        "WITH x AS (SELECT 1) INSERT INTO orders SELECT * FROM x",
+        "PRAGMA table_info(orders)",
+    ],
+)
+def test_writes_are_rejected(orders_db, query):
+    result = validate_sql(query)
+
+    assert not result.ok
+    assert result.error.startswith("Error:")
+
+
+def test_multiple_statements_are_rejected(orders_db):
+    result = validate_sql("SELECT 1; DROP TABLE orders")
+
+    assert result.error == "Error: Only a single SQL statement can be run at a time."
+
+
+def test_unknown_column_is_rejected(orders_db):
+    result = validate_sql("SELECT total FROM orders")
+
+    assert not result.ok
+    assert "no such column: total" in result.error
+
+
+def test_keywords_inside_literals_are_allowed(orders_db):
+    result = validate_sql(
+        "SELECT id FROM orders WHERE 'delete; drop' != '' "
+        "AND amount BETWEEN 1 AND 10;"
+    )
+
+    assert result.ok and result.error is None
+    assert result.risky == ["BETWEEN"]
+
+
+def test_sql_is_extracted_from_code_fences():
+    assert extract_sql("Here:\n```sql\nSELECT 1\n```") == "SELECT 1"